@@ -7,18 +7,26 @@ import json
 from typing import List, Dict, Any, Optional
 import threading
 import uuid
-import pickle
 import logging
 import traceback
-import requests
+import time
 
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 
 from mcp.context import Context, MessageRole, Message
 from mcp.providers import ProviderFactory
-from mcp.utils import truncate_context_if_needed
-from mcp.memory import ConversationMemory, generate_conversation_summary, extract_key_facts
+from mcp.packer import PromptPacker, PromptChunk
+from mcp.summarizer import TreeSummarizer, document_hash
+from mcp.memory import (
+    ConversationMemory, generate_conversation_summary, extract_key_facts,
+    generate_incremental_summary, extract_turn_facts, estimate_prompt_tokens,
+    build_summary_context, build_incremental_summary_context,
+    build_fact_extraction_context, build_turn_fact_extraction_context
+)
+from mcp.scheduler import LLMScheduler, Priority
+from mcp.cache import LLMResponseCache
+from mcp.memory_worker import MemoryMaintenanceWorker
 
 from document_processing.loaders import load_documents, Document
 from document_processing.splitters import CharacterTextSplitter
@@ -32,11 +40,20 @@ from code_interpreter.executor import execute_code, install_packages
 
 from data_preprocessing.normalizer import preprocess_data_file
 
-from retrieval_enhancement.query_enhancer import rewrite_query, generate_hyde_document
+from retrieval_enhancement.query_enhancer import rewrite_query, generate_hyde_document, build_rewrite_context, clean_rewritten_query
+from retrieval_enhancement.speculative import rewrite_skip_reason, speculative_retrieve
+from retrieval_enhancement.multi_query import multi_query_retrieve
+from retrieval_enhancement.rerank import get_reranker
+
+from server.response_store import ResponseStore
+from server.streams import StreamRegistry
+from server.runtime import ChatRuntime, QueueFullError
+from server.model_warmup import ModelWarmer
+from server.model_catalog import ModelCatalog, compute_etag, etag_matches
 
 # Initialize Flask app
 app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+CORS(app, expose_headers=['ETag'])  # Enable CORS for all routes; the frontend reads ETag for conditional requests
 
 # Initialize chat components
 document_store = DocumentStore()
@@ -46,20 +63,104 @@ base_system_prompt = "You are a helpful assistant. Provide clear and concise ans
 
 # Store user sessions
 sessions = {}
-responses = {}
 
-RESPONSES_FILE = os.path.join(tempfile.gettempdir(), "mcp_responses.pkl")
+RESPONSES_DB = os.path.join(tempfile.gettempdir(), "mcp_responses.db")
+responses = ResponseStore(RESPONSES_DB)
+MAX_RESPONSE_WAIT_SECONDS = 30.0
+
+# Token streams for in-flight messages, read by /api/chat/stream
+token_streams = StreamRegistry()
+
+# Shared event loop that runs all chat jobs, with bounded concurrency and queue
+CHAT_MAX_CONCURRENCY = int(os.environ.get("CHAT_MAX_CONCURRENCY", "2"))
+CHAT_MAX_QUEUE_SIZE = int(os.environ.get("CHAT_MAX_QUEUE_SIZE", "32"))
+chat_runtime = ChatRuntime(max_concurrency=CHAT_MAX_CONCURRENCY, max_queue_size=CHAT_MAX_QUEUE_SIZE)
+
+# Priority scheduler shared by every LLM call, so answers are not stuck behind memory work
+LLM_BACKEND_CONCURRENCY = int(os.environ.get("LLM_BACKEND_CONCURRENCY", "2"))
+llm_scheduler = LLMScheduler(max_concurrency_per_backend=LLM_BACKEND_CONCURRENCY)
+
+# How many per-document LLM calls an analysis command keeps in flight at once
+ANALYSIS_CONCURRENCY = int(os.environ.get("ANALYSIS_CONCURRENCY", str(LLM_BACKEND_CONCURRENCY)))
+
+# Token budget for a chat prompt, and how many chunks retrieval offers the prompt packer
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "4000"))
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", "5"))
+
+# Optional second stage: vector search returns RERANK_CANDIDATES chunks and the reranker
+# ("lexical" or "cross-encoder") keeps the best; "none" uses the vector ranking as is
+RERANKER = os.environ.get("RERANKER", "none")
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "20"))
+reranker = get_reranker(RERANKER)
+
+# Maximal-marginal-relevance weight for vector search (1.0 = similarity only, lower = more
+# diverse chunks); unset keeps plain similarity ranking
+MMR_LAMBDA = float(os.environ["MMR_LAMBDA"]) if os.environ.get("MMR_LAMBDA") else None
+
+# "speculative" retrieves on the original query at once and fuses in the rewrite if it
+# arrives before the deadline; "blocking" waits for the rewrite before retrieving
+QUERY_REWRITE_MODE = os.environ.get("QUERY_REWRITE_MODE", "speculative")
+QUERY_REWRITE_DEADLINE_SECONDS = float(os.environ.get("QUERY_REWRITE_DEADLINE_SECONDS", "1.5"))
+
+# Latency budget for generating rewrites and the HyDE passage with retrieval_strategy "multi_query"
+MULTI_QUERY_BUDGET_SECONDS = float(os.environ.get("MULTI_QUERY_BUDGET_SECONDS", "4.0"))
+RETRIEVAL_STRATEGIES = ("default", "multi_query")
+
+# "prefix_stable" keeps system prompt, summary and history as a stable prefix so Ollama
+# can reuse its prompt cache; "legacy" embeds retrieved documents in the system prompt
+PROMPT_LAYOUT = os.environ.get("PROMPT_LAYOUT", "prefix_stable")
+# Messages already folded into the summary that "prefix_stable" still sends verbatim
+RECENT_TURNS_AFTER_SUMMARY = int(os.environ.get("RECENT_TURNS_AFTER_SUMMARY", "5"))
+
+# How long Ollama keeps a model and its prompt cache loaded after a request
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_BASE_URL = "http://localhost:11434"
+DEFAULT_MODEL = "gemma3:12b"
+
+# Load models before the first chat needs them: the default model at startup, others on selection
+model_warmer = ModelWarmer(base_url=OLLAMA_BASE_URL, keep_alive=OLLAMA_KEEP_ALIVE)
+WARMUP_ON_START = os.environ.get("WARMUP_ON_START", "1") == "1"
+
+# Model list for the selector, refreshed in the background together with load states
+model_catalog = ModelCatalog(
+    base_url=OLLAMA_BASE_URL,
+    refresh_interval=float(os.environ.get("MODEL_CATALOG_REFRESH_SECONDS", "60")),
+    timeout=2.0,
+    on_refresh=model_warmer.refresh
+)
+
+# Retrieve long-term facts by embedding similarity instead of topic names in the query
+SEMANTIC_MEMORY = os.environ.get("SEMANTIC_MEMORY", "0") == "1"
+
+# Cache for auxiliary LLM calls that often repeat byte-identical prompts (opt-in per call site)
+llm_cache = LLMResponseCache(
+    max_entries=512,
+    ttl_seconds=24 * 3600,
+    disk_path=os.path.join(tempfile.gettempdir(), "mcp_llm_cache.db")
+)
+
+# Map-reduce summarizer for /deep_analyze; intermediate summaries are cached by content hash
+DOCUMENT_SUMMARY_TOKENS = int(os.environ.get("DOCUMENT_SUMMARY_TOKENS", "1500"))
+SUMMARY_GROUP_TOKENS = int(os.environ.get("SUMMARY_GROUP_TOKENS", "2500"))
+document_summarizer = TreeSummarizer(
+    max_tokens=DOCUMENT_SUMMARY_TOKENS,
+    group_tokens=SUMMARY_GROUP_TOKENS,
+    max_concurrency=ANALYSIS_CONCURRENCY,
+    cache=llm_cache
+)
+
+# Build each uploaded document's hierarchical summary at background priority once ingestion
+# is done; analysis commands use it instead of summarizing on demand
+PRECOMPUTE_SUMMARIES = os.environ.get("PRECOMPUTE_SUMMARIES", "0") == "1"
+# Stored summaries are keyed by model and a hash of the document's chunks, in a bounded
+# LRU with an on-disk tier so they survive restarts
+document_summaries = LLMResponseCache(
+    max_entries=int(os.environ.get("DOCUMENT_SUMMARY_CACHE_SIZE", "128")),
+    ttl_seconds=7 * 24 * 3600,
+    disk_path=os.path.join(tempfile.gettempdir(), "mcp_document_summaries.db"),
+    max_disk_entries=int(os.environ.get("DOCUMENT_SUMMARY_DISK_ENTRIES", "1024"))
+)
 
-# Load existing responses if available
-try:
-    if os.path.exists(RESPONSES_FILE):
-        with open(RESPONSES_FILE, 'rb') as f:
-            responses = pickle.load(f)
-    else:
-        responses = {}
-except:
-    responses = {}
-    
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -73,10 +174,13 @@ logger = logging.getLogger(__name__)
 def get_or_create_session(session_id):
     """Get existing session or create a new one"""
     if session_id not in sessions:
-        default_model = "gemma3:12b"
-        provider = ProviderFactory.create_provider("ollama", model=default_model)
+        default_model = DEFAULT_MODEL
+        provider = ProviderFactory.create_provider("ollama", model=default_model, keep_alive=OLLAMA_KEEP_ALIVE)
         sessions[session_id] = {
-            "memory": ConversationMemory(max_short_term_messages=20),
+            "memory": ConversationMemory(
+                max_short_term_messages=20,
+                embedding_generator=embedding_generator if SEMANTIC_MEMORY else None
+            ),
             "provider": provider,
             "context": Context(system_prompt=base_system_prompt),
             "message_count": 0,
@@ -100,8 +204,8 @@ async def process_facts_in_background(provider, memory, message):
         
         for topic, fact_list in facts.items():
             for fact in fact_list:
-                memory.add_to_long_term(topic, fact)
-                logger.info(f"Added fact to memory: {topic} - {fact}")
+                if memory.add_to_long_term(topic, fact):
+                    logger.info(f"Added fact to memory: {topic} - {fact}")
     except Exception as e:
         logger.error(f"Error in fact extraction: {e}")
         logger.error(traceback.format_exc())
@@ -110,7 +214,7 @@ async def generate_summary_in_background(provider, memory):
     """Generate a conversation summary in the background."""
     try:
         logger.info("Starting summary generation...")
-        summary = await generate_conversation_summary(provider, memory.short_term_memory)
+        summary = await generate_conversation_summary(provider, memory.get_short_term_messages())
         
         if not summary:
             logger.warning("Generated empty summary")
@@ -122,6 +226,100 @@ async def generate_summary_in_background(provider, memory):
         logger.error(f"Error in summary generation: {e}")
         logger.error(traceback.format_exc())
 
+# Incremental memory: fold new messages into the previous summary once enough new
+# tokens have accumulated, and extract facts from each turn with a single call
+INCREMENTAL_MEMORY = os.environ.get("INCREMENTAL_MEMORY", "1") == "1"
+SUMMARY_TOKEN_THRESHOLD = int(os.environ.get("SUMMARY_TOKEN_THRESHOLD", "400"))
+
+async def process_turn_facts_in_background(provider, memory, user_message, assistant_message):
+    """Extract and store facts from a user/assistant turn in the background."""
+    try:
+        facts = await extract_turn_facts(provider, user_message, assistant_message)
+        
+        if not facts:
+            logger.info("No facts extracted from turn")
+            return
+        
+        for topic, fact_list in facts.items():
+            for fact in fact_list:
+                if memory.add_to_long_term(topic, fact):
+                    logger.info(f"Added fact to memory: {topic} - {fact}")
+    except Exception as e:
+        logger.error(f"Error in turn fact extraction: {e}")
+        logger.error(traceback.format_exc())
+
+async def maintain_session_memory_incrementally(session, messages, summarize):
+    """Incremental memory maintenance. Returns the prompt tokens saved versus the full approach."""
+    memory = session["memory"]
+    background_provider = llm_scheduler.wrap(session["provider"], Priority.BACKGROUND)
+    tokens_saved = 0
+    
+    # One extraction call per user/assistant turn instead of one per message
+    index = 0
+    while index < len(messages):
+        message = messages[index]
+        next_message = messages[index + 1] if index + 1 < len(messages) else None
+        if (message.role == MessageRole.USER and next_message is not None
+                and next_message.role == MessageRole.ASSISTANT):
+            tokens_saved += (
+                estimate_prompt_tokens(build_fact_extraction_context(message))
+                + estimate_prompt_tokens(build_fact_extraction_context(next_message))
+                - estimate_prompt_tokens(build_turn_fact_extraction_context(message, next_message))
+            )
+            await process_turn_facts_in_background(
+                llm_cache.wrap(background_provider), memory, message, next_message
+            )
+            index += 2
+        else:
+            await process_facts_in_background(llm_cache.wrap(background_provider), memory, message)
+            index += 1
+    
+    # Fold only the new messages into the previous summary
+    if summarize:
+        previous_summary = memory.get_latest_summary()
+        new_messages = memory.get_unsummarized_messages()
+        tokens_saved += (
+            estimate_prompt_tokens(build_summary_context(memory.get_short_term_messages()))
+            - estimate_prompt_tokens(build_incremental_summary_context(previous_summary, new_messages))
+        )
+        logger.info(f"Updating summary ({memory.unsummarized_tokens} new tokens since the last one)")
+        summary = await generate_incremental_summary(background_provider, previous_summary, new_messages)
+        if summary:
+            memory.add_summary(summary, covered_messages=new_messages)
+    
+    return tokens_saved
+
+async def maintain_session_memory(session_id, messages, summarize):
+    """Extract facts from new messages and refresh the summary for a session."""
+    session = sessions.get(session_id)
+    if not session:
+        return
+    
+    memory = session["memory"]
+    
+    if INCREMENTAL_MEMORY:
+        tokens_saved = await maintain_session_memory_incrementally(session, messages, summarize)
+        turns = max(sum(1 for message in messages if message.role == MessageRole.USER), 1)
+        total_saved = memory.add_prompt_tokens_saved(tokens_saved)
+        logger.info(
+            f"Incremental memory saved ~{tokens_saved // turns} prompt tokens per turn "
+            f"({total_saved} total for this session)"
+        )
+        return
+    
+    background_provider = llm_scheduler.wrap(session["provider"], Priority.BACKGROUND)
+    
+    for message in messages:
+        logger.info(f"Processing facts from {message.role.value} message")
+        await process_facts_in_background(llm_cache.wrap(background_provider), memory, message)
+    
+    if summarize:
+        logger.info(f"Generating summary (message count: {session['message_count']})")
+        await generate_summary_in_background(background_provider, memory)
+
+# Memory maintenance runs on its own worker, coalescing and debouncing work per session
+memory_worker = MemoryMaintenanceWorker(maintain_session_memory, debounce_seconds=3.0)
+
 # Document processing routes
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
@@ -193,6 +391,12 @@ async def process_document(file_path, session_id, file_id):
             session["uploaded_files"][file_id]["processed"] = True
             
         print(f"Document {file_path} processing complete!")
+        
+        if PRECOMPUTE_SUMMARIES and session:
+            # Run on the long-lived chat loop, whose pooled provider client outlives this upload's loop
+            asyncio.run_coroutine_threadsafe(
+                precompute_document_summary(session, file_id, Path(file_path).name), chat_runtime.loop
+            )
         return True
     except Exception as e:
         print(f"Error processing document: {e}")
@@ -200,6 +404,37 @@ async def process_document(file_path, session_id, file_id):
         traceback.print_exc()
         return False
     
+async def precompute_document_summary(session, file_id, document_name):
+    """Build and store the hierarchical summary of an ingested document at background priority."""
+    file_info = session["uploaded_files"].get(file_id, {})
+    complete_doc_chunks = retrieve_complete_document(document_name)
+    if not complete_doc_chunks:
+        return
+    
+    model = getattr(session["provider"], "model", "")
+    if stored_document_summary(complete_doc_chunks, model) is not None:
+        file_info["summary"] = "ready"
+        return
+    
+    file_info["summary"] = "pending"
+    try:
+        provider = llm_scheduler.wrap(session["provider"], Priority.BACKGROUND)
+        summary, stats = await document_summarizer.summarize(provider, complete_doc_chunks, title=document_name)
+        document_summaries.put(document_summary_key(complete_doc_chunks, model), summary)
+        file_info["summary"] = "ready"
+        logger.info(f"Stored summary for document {document_name}: {stats}")
+    except Exception as e:
+        file_info["summary"] = "failed"
+        logger.error(f"Error precomputing summary for document {document_name}: {e}")
+
+def document_summary_key(complete_doc_chunks: List[str], model: str) -> str:
+    """Key of a stored summary: the model that wrote it and the document's content hash."""
+    return f"document-summary:{model}:{document_hash(complete_doc_chunks)}"
+
+def stored_document_summary(complete_doc_chunks: List[str], model: str) -> Optional[str]:
+    """Get the summary `model` precomputed for a document, if its chunks have not changed since."""
+    return document_summaries.get(document_summary_key(complete_doc_chunks, model))
+
 async def analyze_with_code(provider, data_filepath: str, analysis_question: str, max_attempts: int = 5) -> str:
     """Analyze document using code generation and execution."""
     attempt = 0
@@ -243,7 +478,7 @@ async def analyze_with_code(provider, data_filepath: str, analysis_question: str
         logger.info("-" * 40)
         
         # Execute code with access to the data file
-        success, output, missing_packages = execute_code(code)
+        success, output, missing_packages = await asyncio.to_thread(execute_code, code)
         last_output = output  # Store the output for potential next attempt
         
         if success:
@@ -251,7 +486,7 @@ async def analyze_with_code(provider, data_filepath: str, analysis_question: str
             logger.info("Code execution successful!")
             
             # Generate explanation of results
-            explanation = await explain_analysis_results(provider, analysis_question, output)
+            explanation = await explain_analysis_results(llm_cache.wrap(provider), analysis_question, output)
             
             # Return the complete analysis
             return (
@@ -267,7 +502,7 @@ async def analyze_with_code(provider, data_filepath: str, analysis_question: str
             
             if packages_to_install:
                 logger.info(f"Installing missing packages: {', '.join(packages_to_install)}")
-                install_success, install_message = install_packages(packages_to_install)
+                install_success, install_message = await asyncio.to_thread(install_packages, packages_to_install)
                 
                 if install_success:
                     logger.info(install_message)
@@ -300,7 +535,8 @@ def list_files():
         files.append({
             "id": file_id,
             "name": file_info["name"],
-            "processed": file_info["processed"]
+            "processed": file_info["processed"],
+            "summary": file_info.get("summary", "none")
         })
     
     return jsonify({"files": files})
@@ -313,40 +549,126 @@ def chat():
     message = data.get('message', '')
     session_id = data.get('session_id', 'default')
     enhance_query = data.get('enhance_query', True)  # Default to True for backward compatibility
+    retrieval_strategy = data.get('retrieval_strategy', 'default')
+    if retrieval_strategy not in RETRIEVAL_STRATEGIES:
+        return jsonify({'error': f"Unsupported retrieval strategy: {retrieval_strategy}"}), 400
     
     # Generate a message ID
     message_id = str(uuid.uuid4())
     
-    # Store an empty response
-    responses[message_id] = {
+    # Store an empty response and open a token stream for it
+    save_response(message_id, {
         'status': 'processing',
         'response': None
-    }
+    })
+    token_streams.create(message_id)
     
-    # Start a new thread for async processing
-    threading.Thread(
-        target=lambda: process_chat_message_background(message, session_id, message_id, enhance_query)
-    ).start()
+    # Queue the message on the shared chat runtime
+    try:
+        queue_position = chat_runtime.submit(
+            message_id,
+            lambda: process_chat_message_background(message, session_id, message_id, enhance_query, retrieval_strategy)
+        )
+    except QueueFullError as e:
+        logger.warning(f"Rejecting chat message: {e}")
+        save_response(message_id, {
+            'status': 'error',
+            'response': "The server is busy. Please try again shortly."
+        })
+        response = jsonify({
+            'success': False,
+            'error': 'Server is busy, too many messages queued',
+            'message_id': message_id
+        })
+        response.headers['Retry-After'] = '5'
+        return response, 429
     
     # Return an immediate response with message ID
     return jsonify({
         'success': True,
         'message': 'Message received, processing started',
-        'message_id': message_id
+        'message_id': message_id,
+        'stream_url': f"/api/chat/stream?message_id={message_id}",
+        'queue_position': queue_position
     })
 
 def save_response(message_id, response_data):
-    responses[message_id] = response_data
+    """Record the latest state of a response and close its token stream once finished."""
+    responses.put(message_id, response_data)
+    
+    if response_data.get('status') != 'processing':
+        stream = token_streams.get(message_id)
+        if stream:
+            stream.close(response_data['status'], response_data.get('response'))
+
+def format_sse_event(event_id: int, event: str, payload: Dict[str, Any]) -> str:
+    """Format a single Server-Sent Event."""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/api/chat/stream', methods=['GET'])
+def stream_response():
+    """Stream the tokens of a response as Server-Sent Events.
+    
+    Every event carries a sequential ID. A reconnecting client sends the last
+    ID it received (the `Last-Event-ID` header, or `last_event_id` in the query
+    string) and the stream resumes after it.
+    """
+    message_id = request.args.get('message_id')
+    
+    if not message_id:
+        return jsonify({
+            'status': 'error',
+            'message': 'Missing message ID'
+        }), 400
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id', '0')
     try:
-        with open(RESPONSES_FILE, 'wb') as f:
-            pickle.dump(responses, f)
-    except Exception as e:
-        print(f"Error saving responses: {e}")
+        last_event_id = int(last_event_id)
+    except ValueError:
+        last_event_id = 0
+    
+    stream = token_streams.get(message_id)
+    if stream is None:
+        # The stream is gone (finished long ago or server restarted), send the stored result
+        response_data = responses.get(message_id)
+        if response_data is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Response not found'
+            }), 404
+        
+        def replay():
+            yield format_sse_event(last_event_id + 1, 'done', {
+                'status': response_data['status'],
+                'response': response_data.get('response')
+            })
+        
+        return Response(replay(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    
+    def generate():
+        after = last_event_id
+        while True:
+            events, closed = stream.read(after, timeout=15.0)
+            if not events and not closed:
+                # Keep the connection alive through proxies
+                yield ": keep-alive\n\n"
+                continue
+            
+            for event_id, event, payload in events:
+                yield format_sse_event(event_id, event, payload)
+                after = event_id
+            
+            if closed and after >= len(stream.events):
+                break
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
-# Modify your @app.route('/api/response') function
 @app.route('/api/response', methods=['GET'])
 def get_response():
-    """Get a response by message ID"""
+    """Get a response by message ID, optionally waiting up to `wait` seconds for it to complete"""
     message_id = request.args.get('message_id')
     
     if not message_id:
@@ -355,33 +677,34 @@ def get_response():
             'message': 'Missing message ID'
         }), 400
     
-    # Try to get from memory first
-    if message_id in responses:
-        return jsonify(responses[message_id])
-    
-    # If not in memory, try to load from disk
+    # Long-poll: with `wait`, block until the response completes or the timeout expires
     try:
-        if os.path.exists(RESPONSES_FILE):
-            with open(RESPONSES_FILE, 'rb') as f:
-                saved_responses = pickle.load(f)
-                if message_id in saved_responses:
-                    # Update in-memory cache
-                    responses[message_id] = saved_responses[message_id]
-                    return jsonify(saved_responses[message_id])
-    except Exception as e:
-        print(f"Error loading saved responses: {e}")
+        wait = min(float(request.args.get('wait', 0)), MAX_RESPONSE_WAIT_SECONDS)
+    except ValueError:
+        wait = 0
+    
+    if wait > 0:
+        response_data = responses.wait(message_id, timeout=wait)
+    else:
+        response_data = responses.get(message_id)
+    
+    if response_data is not None:
+        if response_data.get('status') == 'processing':
+            response_data = dict(response_data, queue_position=chat_runtime.queue_position(message_id))
+        return jsonify(response_data)
     
     return jsonify({
         'status': 'error',
         'message': 'Response not found'
     }), 404
 
-def process_chat_message_background(message, session_id, message_id, enhance_query=True):
-    """Process a chat message in the background"""
+async def process_chat_message_background(message, session_id, message_id, enhance_query=True, retrieval_strategy="default"):
+    """Process a chat message as a job on the shared chat runtime"""
     try:
         session = get_or_create_session(session_id)
         memory = session["memory"]
-        provider = session["provider"]
+        provider = llm_scheduler.wrap(session["provider"], Priority.INTERACTIVE)
+        rewrite_provider = llm_scheduler.wrap(provider, Priority.QUERY_REWRITE)
         context = session["context"]
         
         # Multi-file analysis command
@@ -395,22 +718,16 @@ def process_chat_message_background(message, session_id, message_id, enhance_que
             question = parts[1].replace("Question: ", "") if len(parts) > 1 else "Analyze these documents."
             
             try:
-                # Create a new event loop just for this task
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                
                 # Run the analysis
-                result = loop.run_until_complete(analyze_multiple_documents(provider, filenames, question))
-                loop.close()
+                result, timings = await analyze_multiple_documents(provider, filenames, question)
                 
                 # Update status
                 response_data = {
                     'status': 'completed',
-                    'response': result
+                    'response': result,
+                    'timings': timings
                 }
-                responses[message_id] = response_data
-                if 'save_response' in globals():
-                    save_response(message_id, response_data)
+                save_response(message_id, response_data)
                 
                 # Add to memory
                 user_message = Message(role=MessageRole.USER, content=message)
@@ -421,12 +738,10 @@ def process_chat_message_background(message, session_id, message_id, enhance_que
             except Exception as e:
                 logger.error(f"Error in multi-file analysis: {e}")
                 logger.error(traceback.format_exc())
-                responses[message_id] = {
+                save_response(message_id, {
                     'status': 'error',
                     'response': f"Error analyzing multiple documents: {str(e)}"
-                }
-                if 'save_response' in globals():
-                    save_response(message_id, responses[message_id])
+                })
             
             return
         
@@ -439,22 +754,15 @@ def process_chat_message_background(message, session_id, message_id, enhance_que
             question = parts[1].replace("Question: ", "") if len(parts) > 1 else "Analyze this document thoroughly."
             
             try:
-                # Create a new event loop just for this task
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                
                 # Run the hierarchical analysis
-                result = loop.run_until_complete(analyze_hierarchical(provider, doc_name, question))
-                loop.close()
+                result = await analyze_hierarchical(provider, doc_name, question)
                 
                 # Update status
                 response_data = {
                     'status': 'completed',
                     'response': result
                 }
-                responses[message_id] = response_data
-                if 'save_response' in globals():
-                    save_response(message_id, response_data)
+                save_response(message_id, response_data)
                 
                 # Add to memory
                 user_message = Message(role=MessageRole.USER, content=message)
@@ -465,12 +773,10 @@ def process_chat_message_background(message, session_id, message_id, enhance_que
             except Exception as e:
                 logger.error(f"Error in deep document analysis: {e}")
                 logger.error(traceback.format_exc())
-                responses[message_id] = {
+                save_response(message_id, {
                     'status': 'error',
                     'response': f"Error performing deep analysis: {str(e)}"
-                }
-                if 'save_response' in globals():
-                    save_response(message_id, responses[message_id])
+                })
             
             return
             
@@ -485,16 +791,13 @@ def process_chat_message_background(message, session_id, message_id, enhance_que
             
             try:
                 # Use the improved code-based multi-document analysis
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                result = loop.run_until_complete(analyze_multiple_documents_with_code(provider, filenames, question))
+                result = await analyze_multiple_documents_with_code(provider, filenames, question)
                 
                 # Update status
                 response_data = {
                     'status': 'completed',
                     'response': result
                 }
-                responses[message_id] = response_data
                 save_response(message_id, response_data)
                 
                 # Add to memory
@@ -505,11 +808,10 @@ def process_chat_message_background(message, session_id, message_id, enhance_que
             except Exception as e:
                 logger.error(f"Error in multi-file code analysis: {e}")
                 logger.error(traceback.format_exc())
-                responses[message_id] = {
+                save_response(message_id, {
                     'status': 'error',
                     'response': f"Error analyzing multiple documents with code: {str(e)}"
-                }
-                save_response(message_id, responses[message_id])
+                })
             
             return
             
@@ -519,53 +821,73 @@ def process_chat_message_background(message, session_id, message_id, enhance_que
         session["message_count"] += 1
         
         # Check if documents are loaded
-        current_system_prompt = base_system_prompt
+        relevant_chunks = []
+        retrieval_info = {}
         if document_store.documents:
             try:
-                # Only enhance the query if the feature is enabled
-                if enhance_query:
-                    # Convert async to sync for this thread
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    enhanced_query = loop.run_until_complete(rewrite_query(provider, message, "expansion"))
-                    relevant_docs = retrieve_relevant_documents(enhanced_query, top_k=3)
-                    logger.info(f"Query enhanced: {message} -> {enhanced_query}")
-                else:
-                    # Use the original query without enhancement
-                    relevant_docs = retrieve_relevant_documents(message, top_k=3)
-                    logger.info("Using original query without enhancement")
-                
-                if relevant_docs:
-                    current_system_prompt = (
-                        f"{base_system_prompt}\n\n"
-                        f"You have access to the following documents that may be relevant to the user's question: "
-                        f"\"{message}\"\n\n"
-                        f"{' '.join(relevant_docs)}"
-                    )
+                relevant_chunks, retrieval_info = await retrieve_chunks_for_chat(
+                    message, rewrite_provider, enhance_query, retrieval_strategy
+                )
             except Exception as e:
                 logger.error(f"Error enhancing query: {e}. Using original query.")
-                relevant_docs = retrieve_relevant_documents(message, top_k=3)
-        
-        # Get relevant context from memory
-        memory_context = memory.get_context_for_query(message)
+                relevant_chunks = await asyncio.to_thread(search_document_chunks, message, top_k=RETRIEVAL_TOP_K)
         
-        # Create a new context with the current system prompt
-        augmented_context = Context(system_prompt=current_system_prompt)
+        # Get relevant context from memory (embedding the query for semantic facts may block)
+        memory_context = await asyncio.to_thread(memory.get_context_for_query, message)
         
-        # Add memory context messages
-        for msg in memory_context:
-            augmented_context.add_message(msg.role, msg.content, **msg.metadata)
+        # History since the last summary, plus the last few turns it covers, only grows until
+        # the next summary, which keeps the prompt prefix stable across turns; the legacy
+        # layout uses the recent-message window
+        if PROMPT_LAYOUT == "prefix_stable":
+            history = memory.get_prompt_history(min_recent=RECENT_TURNS_AFTER_SUMMARY)
+        else:
+            history = [msg for msg in memory_context if msg.metadata.get("source") not in ("long_term_memory", "summary")]
         
-        # Add current user message
-        augmented_context.add_message(MessageRole.USER, message)
+        # Pack question, recent turns, chunks, facts and summary into the prompt budget
+        # (memory messages are shared, so their cached token counts are reused)
+        packed = PromptPacker(max_tokens=PROMPT_TOKEN_BUDGET).pack(
+            question=message,
+            system_prompt=base_system_prompt,
+            documents_preamble=(
+                f"You have access to the following documents that may be relevant to the user's question: "
+                f"\"{message}\"\n\n"
+            ),
+            recent_messages=[msg for msg in history if msg is not user_message],
+            chunks=relevant_chunks,
+            facts=[msg for msg in memory_context if msg.metadata.get("source") == "long_term_memory"],
+            summary=next((msg for msg in memory_context if msg.metadata.get("source") == "summary"), None),
+            layout=PROMPT_LAYOUT
+        )
+        optimized_context = packed.context
         
-        # Truncate context if needed to fit within token limit
-        optimized_context = truncate_context_if_needed(augmented_context)
+        # Generate response, forwarding tokens to any stream listeners
+        stream = token_streams.get(message_id)
+        response_parts = []
+        usage = {}
+        complete = False
+        async for chunk in provider.stream_response(optimized_context):
+            if chunk.delta:
+                response_parts.append(chunk.delta)
+                if stream:
+                    stream.push(chunk.delta)
+            if chunk.done:
+                usage = chunk.usage
+                complete = chunk.complete
+        response = "".join(response_parts)
         
-        # Generate response
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        response = loop.run_until_complete(provider.generate_response(optimized_context))
+        if not complete:
+            # The stream was cut short: report it and keep the partial answer out of memory
+            logger.warning(f"Response {message_id} was cut short after {len(response)} characters")
+            save_response(message_id, {
+                'status': 'error',
+                'response': "Sorry, the response was cut short before it finished. Please try again.",
+                'partial_response': response,
+                'truncated': True,
+                'usage': usage,
+                'prompt': packed.report,
+                'retrieval': retrieval_info
+            })
+            return
         
         # Add to memory
         assistant_message = Message(role=MessageRole.ASSISTANT, content=response)
@@ -576,29 +898,21 @@ def process_chat_message_background(message, session_id, message_id, enhance_que
         context.add_message(MessageRole.ASSISTANT, response)
         
         # Store the completed response
-        responses[message_id] = {
+        save_response(message_id, {
             'status': 'completed',
-            'response': response
-        }
+            'response': response,
+            'usage': usage,
+            'prompt': packed.report,
+            'retrieval': retrieval_info
+        })
         
-        # Background processing
-                
-        try:
-            # Process facts from user message
-            logger.info("Processing facts from user message")
-            loop.run_until_complete(process_facts_in_background(provider, memory, user_message))
-            
-            # Process facts from assistant message
-            logger.info("Processing facts from assistant message")
-            loop.run_until_complete(process_facts_in_background(provider, memory, assistant_message))
-            
-            # Generate summary every 2 messages
-            if session["message_count"] % 2 == 0:
-                logger.info(f"Generating summary (message count: {session['message_count']})")
-                loop.run_until_complete(generate_summary_in_background(provider, memory))
-        except Exception as e:
-            logger.error(f"Error in background tasks: {e}")
-            logger.error(traceback.format_exc())
+        # Hand fact extraction and summarization to the memory worker, off the critical path
+        if INCREMENTAL_MEMORY:
+            # Summarize once enough new conversation has accumulated
+            summarize = memory.unsummarized_tokens >= SUMMARY_TOKEN_THRESHOLD
+        else:
+            summarize = session["message_count"] % 2 == 0
+        memory_worker.submit(session_id, [user_message, assistant_message], summarize=summarize)
         
     except Exception as e:
         import traceback
@@ -606,48 +920,131 @@ def process_chat_message_background(message, session_id, message_id, enhance_que
         print(f"Error processing message: {e}")
         
         # Store the error response
-        responses[message_id] = {
+        save_response(message_id, {
             'status': 'error',
             'response': f"Sorry, I encountered an error: {str(e)}"
-        }
+        })
 
 # Helper functions
-def retrieve_relevant_documents(query: str, top_k: int = 5) -> List[str]:
-    """Retrieve documents relevant to the query using vector search."""
+def search_result_to_chunk(result: Dict[str, Any]) -> PromptChunk:
+    """Turn a vector search result into a prompt chunk labelled with its source."""
+    metadata = result["metadata"]
+    source = metadata.get("source", "unknown")
+    filename = Path(source).name
+    
+    # Label the chunk with its metadata
+    header = f"Document: {filename}\n"
+    
+    # Add additional metadata if available
+    if "page" in metadata:
+        header += f"Page: {metadata['page']}\n"
+    if "chunk" in metadata:
+        header += f"Chunk: {metadata['chunk']}/{metadata.get('chunk_of', '?')}\n"
+    
+    return PromptChunk(text=result["text"], header=header, metadata=metadata)
+
+def candidate_count(top_k: int) -> int:
+    """How many chunks the vector search should return so the reranker can keep `top_k`."""
+    return max(top_k, RERANK_CANDIDATES) if reranker is not None else top_k
+
+def rerank_chunks(query: str, chunks: List[PromptChunk], top_k: int) -> List[PromptChunk]:
+    """Keep the best `top_k` chunks by the second-stage reranker, if one is configured."""
+    if reranker is None:
+        return chunks[:top_k]
+    return reranker.rerank(query, chunks, text=lambda chunk: chunk.text, top_k=top_k)
+
+def search_document_chunks(query: str, top_k: int = 5) -> List[PromptChunk]:
+    """Retrieve chunks relevant to the query using vector search, best first."""
     if not document_store.documents:
         return []
         
     try:
         # Search vector database
-        search_results = vector_db.search(query, embedding_generator, top_k=top_k)
-        
-        # Format results
-        relevant_docs = []
-        for result in search_results:
-            text = result["text"]
-            metadata = result["metadata"]
-            source = metadata.get("source", "unknown")
-            filename = Path(source).name
-            
-            # Format document with metadata
-            doc_info = f"Document: {filename}\n"
-            
-            # Add additional metadata if available
-            if "page" in metadata:
-                doc_info += f"Page: {metadata['page']}\n"
-            if "chunk" in metadata:
-                doc_info += f"Chunk: {metadata['chunk']}/{metadata.get('chunk_of', '?')}\n"
-            
-            # Add the content
-            doc_info += f"{text}\n\n"
-            
-            relevant_docs.append(doc_info)
-        
-        return relevant_docs
+        search_results = vector_db.search(query, embedding_generator, top_k=candidate_count(top_k), mmr_lambda=MMR_LAMBDA)
+        return rerank_chunks(query, [search_result_to_chunk(result) for result in search_results], top_k)
     except Exception as e:
         print(f"Error during document retrieval: {e}")
         return []
 
+def search_document_chunks_many(queries: List[str], top_k: int = 5) -> List[List[PromptChunk]]:
+    """Retrieve chunks for several queries with one batched embedding and search, one list per query."""
+    if not document_store.documents:
+        return [[] for _ in queries]
+    
+    try:
+        result_lists = vector_db.search_many(queries, embedding_generator, top_k=candidate_count(top_k), mmr_lambda=MMR_LAMBDA)
+        return [
+            rerank_chunks(query, [search_result_to_chunk(result) for result in results], top_k)
+            for query, results in zip(queries, result_lists)
+        ]
+    except Exception as e:
+        print(f"Error during document retrieval: {e}")
+        return [[] for _ in queries]
+
+def llm_under_load() -> bool:
+    """Whether chat jobs or LLM requests are already waiting for a slot."""
+    if chat_runtime.stats()["queued"] > 0:
+        return True
+    return any(backend["queued"] > 0 for backend in llm_scheduler.stats()["backends"].values())
+
+async def retrieve_chunks_for_chat(message: str, rewrite_provider, enhance_query: bool = True, retrieval_strategy: str = "default"):
+    """
+    Retrieve chunks for a chat message, rewriting the query when it is likely to help.
+    
+    Returns the chunks and a report of the retrieval (mode, rewrite outcome, timings).
+    """
+    if enhance_query and retrieval_strategy == "multi_query":
+        if not llm_under_load():
+            # Candidates from every query; the fused list keeps the best RETRIEVAL_TOP_K
+            return await multi_query_retrieve(
+                message,
+                llm_cache.wrap(rewrite_provider),
+                search_many=lambda queries: search_document_chunks_many(queries, top_k=RETRIEVAL_TOP_K),
+                key=lambda chunk: chunk.text,
+                top_k=RETRIEVAL_TOP_K,
+                budget_seconds=MULTI_QUERY_BUDGET_SECONDS
+            )
+        logger.info("LLM backends are busy, falling back to single-query retrieval")
+        chunks = await asyncio.to_thread(search_document_chunks, message, top_k=RETRIEVAL_TOP_K)
+        return chunks, {"mode": "original", "fallback": "under_load"}
+    
+    if not enhance_query:
+        # Use the original query without enhancement
+        logger.info("Using original query without enhancement")
+        chunks = await asyncio.to_thread(search_document_chunks, message, top_k=RETRIEVAL_TOP_K)
+        return chunks, {"mode": "original"}
+    
+    skip_reason = rewrite_skip_reason(message)
+    if skip_reason:
+        logger.info(f"Skipping query rewrite ({skip_reason})")
+        chunks = await asyncio.to_thread(search_document_chunks, message, top_k=RETRIEVAL_TOP_K)
+        return chunks, {"mode": "original", "rewrite": f"skipped:{skip_reason}"}
+    
+    cached_provider = llm_cache.wrap(rewrite_provider)
+    if QUERY_REWRITE_MODE != "speculative":
+        enhanced_query = await rewrite_query(cached_provider, message, "expansion")
+        chunks = await asyncio.to_thread(search_document_chunks, enhanced_query, top_k=RETRIEVAL_TOP_K)
+        logger.info(f"Query enhanced: {message} -> {enhanced_query}")
+        return chunks, {"mode": "blocking", "rewritten_query": enhanced_query}
+    
+    # A rewrite already in the cache costs nothing, so it is used without a deadline
+    cache_key = llm_cache.make_key(getattr(rewrite_provider, "model", ""), build_rewrite_context(message, "expansion"))
+    cached = llm_cache.peek(cache_key)
+    
+    return await speculative_retrieve(
+        message,
+        retrieve=lambda query: search_document_chunks(query, top_k=RETRIEVAL_TOP_K),
+        rewrite=lambda: rewrite_query(cached_provider, message, "expansion"),
+        key=lambda chunk: chunk.text,
+        top_k=RETRIEVAL_TOP_K,
+        deadline_seconds=QUERY_REWRITE_DEADLINE_SECONDS,
+        cached_rewrite=clean_rewritten_query(cached) if cached is not None else None
+    )
+
+def retrieve_relevant_documents(query: str, top_k: int = 5) -> List[str]:
+    """Retrieve documents relevant to the query using vector search."""
+    return [PromptPacker.format_chunk(chunk) for chunk in search_document_chunks(query, top_k=top_k)]
+
 def retrieve_complete_document(document_name: str) -> List[str]:
     """Retrieve all chunks of a specific document."""
     matching_docs = []
@@ -667,38 +1064,67 @@ def retrieve_complete_document(document_name: str) -> List[str]:
     
     return matching_docs
 
-async def analyze_multiple_documents(provider, filenames: List[str], question: str) -> str:
-    """Analyze multiple documents by using a multi-stage approach."""
+async def summarize_document_for_analysis(provider, doc_name: str, doc_content: str) -> str:
+    """Summarize one document for multi-document analysis."""
+    # Limit the content to a reasonable size for summarization
+    if len(doc_content) > 10000:  # If document is large
+        doc_content = doc_content[:10000] + "...[content truncated for length]"
+        
+    summary_context = Context(
+        system_prompt=(
+            "You are a document summarizer. Create a concise summary of the following document. "
+            "Focus on the key points and information that would be most relevant for analysis."
+        )
+    )
+    summary_context.add_message(MessageRole.USER, f"Document: {doc_name}\n\n{doc_content}")
+    
+    # Summaries of unchanged documents are served from the cache
+    summary = await llm_cache.wrap(provider).generate_response(summary_context)
+    logger.info(f"Generated summary for document: {doc_name}")
+    return summary
+
+async def analyze_multiple_documents(provider, filenames: List[str], question: str):
+    """
+    Analyze multiple documents by using a multi-stage approach.
+    
+    Returns the analysis and per-stage timings in milliseconds.
+    """
     logger.info(f"Starting analysis of documents: {filenames}")
+    start = time.perf_counter()
+    timings = {}
     
-    # Step 1: Gather initial summaries of each document
-    document_summaries = []
+    # Step 1: Retrieve every document once; the contents are reused for the final prompt
+    stage_start = time.perf_counter()
+    document_contents = {}
+    stored_summaries = {}
     for doc_name in filenames:
-        complete_doc = retrieve_complete_document(doc_name)
+        complete_doc = await asyncio.to_thread(retrieve_complete_document, doc_name)
         if complete_doc:
-            # Create a summary of this document
-            doc_content = "".join(complete_doc)
-            
-            # Limit the content to a reasonable size for summarization
-            if len(doc_content) > 10000:  # If document is large
-                doc_content = doc_content[:10000] + "...[content truncated for length]"
-                
-            summary_context = Context(
-                system_prompt=(
-                    "You are a document summarizer. Create a concise summary of the following document. "
-                    "Focus on the key points and information that would be most relevant for analysis."
-                )
-            )
-            summary_context.add_message(MessageRole.USER, f"Document: {doc_name}\n\n{doc_content}")
-            
-            # Use await directly - don't create another event loop
-            summary = await provider.generate_response(summary_context)
-            logger.info(f"Generated summary for document: {doc_name}")
-            
-            document_summaries.append({
-                "name": doc_name,
-                "summary": summary
-            })
+            document_contents[doc_name] = "".join(complete_doc)
+            stored = stored_document_summary(complete_doc, getattr(provider, "model", ""))
+            if stored is not None:
+                stored_summaries[doc_name] = stored
+    timings["retrieval_ms"] = round((time.perf_counter() - stage_start) * 1000, 1)
+    
+    # Step 2: Summarize the documents concurrently, at most as many at once as the backend serves;
+    # documents summarized at ingestion use their stored summary
+    stage_start = time.perf_counter()
+    semaphore = asyncio.Semaphore(ANALYSIS_CONCURRENCY)
+    
+    async def summarize(doc_name: str, doc_content: str) -> str:
+        if doc_name in stored_summaries:
+            return stored_summaries[doc_name]
+        async with semaphore:
+            return await summarize_document_for_analysis(provider, doc_name, doc_content)
+    
+    summaries = await asyncio.gather(*[
+        summarize(doc_name, doc_content) for doc_name, doc_content in document_contents.items()
+    ])
+    document_summaries = [
+        {"name": doc_name, "summary": summary}
+        for doc_name, summary in zip(document_contents, summaries)
+    ]
+    timings["summaries_ms"] = round((time.perf_counter() - stage_start) * 1000, 1)
     
     # Step 2: Create a plan for analysis based on the question and document summaries
     plan_context = Context(
@@ -709,6 +1135,7 @@ async def analyze_multiple_documents(provider, filenames: List[str], question: s
         )
     )
     
+    stage_start = time.perf_counter()
     summaries_text = "\n\n".join([
         f"Document: {doc['name']}\nSummary: {doc['summary']}" for doc in document_summaries
     ])
@@ -723,8 +1150,10 @@ async def analyze_multiple_documents(provider, filenames: List[str], question: s
     # Use await directly - don't create another event loop
     analysis_plan = await provider.generate_response(plan_context)
     logger.info("Generated analysis plan")
+    timings["plan_ms"] = round((time.perf_counter() - stage_start) * 1000, 1)
     
     # Step 3: Perform the actual analysis based on the plan
+    stage_start = time.perf_counter()
     analysis_context = Context(
         system_prompt=(
             f"You are a document analysis expert. You have been given the following documents:\n"
@@ -735,12 +1164,9 @@ async def analyze_multiple_documents(provider, filenames: List[str], question: s
     )
     
     # Include relevant document content based on the plan
-    relevant_content = []
-    for doc_name in filenames:
-        complete_doc = retrieve_complete_document(doc_name)
-        if complete_doc:
-            doc_content = "".join(complete_doc)
-            relevant_content.append(f"Document: {doc_name}\n\n{doc_content}")
+    relevant_content = [
+        f"Document: {doc_name}\n\n{doc_content}" for doc_name, doc_content in document_contents.items()
+    ]
     
     analysis_context.add_message(
         MessageRole.USER,
@@ -752,8 +1178,14 @@ async def analyze_multiple_documents(provider, filenames: List[str], question: s
     # Use await directly - don't create another event loop
     final_analysis = await provider.generate_response(analysis_context)
     logger.info("Generated final analysis")
+    timings["analysis_ms"] = round((time.perf_counter() - stage_start) * 1000, 1)
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    timings["documents"] = len(document_contents)
+    timings["stored_summaries"] = len(stored_summaries)
+    logger.info(f"Multi-document analysis timings: {timings}")
     
-    return f"# Multi-Document Analysis\n\n## Question\n{question}\n\n## Analysis\n{final_analysis}"
+    result = f"# Multi-Document Analysis\n\n## Question\n{question}\n\n## Analysis\n{final_analysis}"
+    return result, timings
 
 async def analyze_hierarchical(provider, document_name: str, question: str) -> str:
     """Analyze a document using a hierarchical approach"""
@@ -764,38 +1196,20 @@ async def analyze_hierarchical(provider, document_name: str, question: str) -> s
     if not complete_doc_chunks:
         return f"No document matching '{document_name}' found."
     
-    # Step 2: Create a high-level summary
-    all_content = "".join(complete_doc_chunks)
-    
-    # For very large documents, summarize in chunks first
-    summaries = []
-    if len(all_content) > 20000:
-        # Split into manageable chunks (e.g., ~10k characters)
-        content_chunks = [all_content[i:i+10000] for i in range(0, len(all_content), 10000)]
-        
-        for i, chunk in enumerate(content_chunks):
-            summary_context = Context(
-                system_prompt="Summarize this document section concisely."
-            )
-            summary_context.add_message(
-                MessageRole.USER, 
-                f"Document section {i+1}/{len(content_chunks)}:\n\n{chunk}"
-            )
-            section_summary = await provider.generate_response(summary_context)
-            summaries.append(section_summary)
-            
-        combined_summary = "\n\n".join(summaries)
+    # Step 2: Create a high-level summary, map-reducing long documents over their chunks,
+    # unless one was stored when the document was ingested
+    combined_summary = stored_document_summary(complete_doc_chunks, getattr(provider, "model", ""))
+    if combined_summary is not None:
+        logger.info(f"Using stored summary for document: {document_name}")
     else:
-        # Document is small enough, create a single summary
-        summary_context = Context(
-            system_prompt="Create a comprehensive summary of this document."
-        )
-        summary_context.add_message(MessageRole.USER, f"Document: {document_name}\n\n{all_content}")
-        combined_summary = await provider.generate_response(summary_context)
+        combined_summary, summary_stats = await document_summarizer.summarize(provider, complete_doc_chunks, title=document_name)
+        logger.info(f"Document summary for {document_name}: {summary_stats}")
     
     # Step 3: Use RAG to retrieve relevant sections based on question
-    enhanced_query = await rewrite_query(provider, question, "expansion")
-    relevant_chunks = retrieve_relevant_documents(enhanced_query, top_k=5)
+    enhanced_query = await rewrite_query(
+        llm_cache.wrap(llm_scheduler.wrap(provider, Priority.QUERY_REWRITE)), question, "expansion"
+    )
+    relevant_chunks = await asyncio.to_thread(retrieve_relevant_documents, enhanced_query, top_k=5)
     
     # Step 4: Create a combined analysis with both the summary and relevant chunks
     analysis_context = Context(
@@ -883,11 +1297,14 @@ def get_memory():
     memory = session["memory"]
     
     # Format memory data for the frontend
+    stats = memory.stats()
     memory_data = {
-        "shortTermCount": len(memory.short_term_memory),
-        "longTermTopics": list(memory.long_term_memory.keys()),
-        "facts": memory.long_term_memory,
-        "summaryCount": len(memory.summaries)
+        "shortTermCount": stats["short_term_count"],
+        "longTermTopics": list(stats["long_term_facts"].keys()),
+        "facts": stats["long_term_facts"],
+        "summaryCount": stats["summaries_count"],
+        "promptTokensSaved": stats["prompt_tokens_saved"],
+        "compaction": stats["compaction"]
     }
     
     return jsonify(memory_data)
@@ -899,10 +1316,7 @@ def get_summary():
     session = get_or_create_session(session_id)
     memory = session["memory"]
     
-    if memory.summaries:
-        return jsonify({"summary": memory.summaries[-1]})
-    else:
-        return jsonify({"summary": ""})
+    return jsonify({"summary": memory.get_latest_summary() or ""})
 
 @app.route('/api/debug/memory-diagnostics', methods=['GET'])
 def memory_diagnostics():
@@ -913,12 +1327,11 @@ def memory_diagnostics():
     
     # Get raw extraction example
     raw_extraction = None
-    if memory.short_term_memory:
-        last_message = memory.short_term_memory[-1]
+    recent_messages = memory.get_recent_messages(1)
+    if recent_messages:
+        last_message = recent_messages[0]
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            provider = session["provider"]
+            provider = llm_scheduler.wrap(session["provider"], Priority.INTERACTIVE)
             
             # Create specialized system prompt
             from mcp.context import Context, MessageRole
@@ -934,62 +1347,76 @@ def memory_diagnostics():
             )
             
             # Get raw response
-            raw_extraction = loop.run_until_complete(provider.generate_response(context))
+            raw_extraction = chat_runtime.run(provider.generate_response(context))
         except Exception as e:
             raw_extraction = f"Error: {str(e)}"
     
+    stats = memory.stats()
     diagnostic_data = {
-        "short_term_count": len(memory.short_term_memory),
-        "long_term_topics": list(memory.long_term_memory.keys()),
-        "long_term_facts": {k: v for k, v in memory.long_term_memory.items()},
-        "summaries_count": len(memory.summaries),
-        "latest_summary": memory.summaries[-1] if memory.summaries else None,
+        "short_term_count": stats["short_term_count"],
+        "long_term_topics": list(stats["long_term_facts"].keys()),
+        "long_term_facts": stats["long_term_facts"],
+        "summaries_count": stats["summaries_count"],
+        "latest_summary": stats["latest_summary"],
+        "compaction": stats["compaction"],
         "raw_extraction_example": raw_extraction
     }
     
     return jsonify(diagnostic_data)
 
+@app.route('/api/debug/chat-queue', methods=['GET'])
+def chat_queue_diagnostics():
+    """Get the chat runtime's queue and concurrency figures"""
+    return jsonify(chat_runtime.stats())
+
+@app.route('/api/debug/llm-scheduler', methods=['GET'])
+def llm_scheduler_diagnostics():
+    """Get LLM queue wait-time metrics per priority class"""
+    return jsonify(llm_scheduler.stats())
+
+@app.route('/api/debug/llm-cache', methods=['GET'])
+def llm_cache_diagnostics():
+    """Get LLM response cache hit-rate metrics"""
+    return jsonify(llm_cache.stats())
+
+@app.route('/api/debug/memory-worker', methods=['GET'])
+def memory_worker_diagnostics():
+    """Get memory maintenance queue counters"""
+    return jsonify(memory_worker.stats())
+
 @app.route('/api/models', methods=['GET'])
 def get_models():
     """Get a list of available Ollama models"""
-    try:
-        # Make a request to Ollama API to get available models
-        response = requests.get("http://localhost:11434/api/tags")
-        if response.status_code == 200:
-            models_data = response.json()
-            # Format the response with relevant model info
-            models = []
-            for model in models_data.get('models', []):
-                name = model.get('name')
-                size = model.get('size', 0)
-                # Convert size to human-readable format (GB or MB)
-                if size > 1_000_000_000:  # If greater than 1GB
-                    size_str = f"{size / 1_000_000_000:.1f}GB"
-                else:
-                    size_str = f"{size / 1_000_000:.1f}MB"
-                
-                models.append({
-                    "name": name,
-                    "size": size_str,
-                    "raw_size": size
-                })
-            
-            # Sort by name
-            models.sort(key=lambda x: x['name'])
-            
-            return jsonify({"models": models})
-        else:
-            return jsonify({"error": "Failed to fetch models from Ollama", "models": []}), 500
-    except Exception as e:
-        logger.error(f"Error fetching models: {e}")
-        # Return some default models in case of error
-        return jsonify({
-            "models": [
-                {"name": "gemma3:12b", "size": "unknown", "raw_size": 0},
-                {"name": "llama3:8b", "size": "unknown", "raw_size": 0},
-                {"name": "mistral:7b", "size": "unknown", "raw_size": 0},
-            ]
-        })
+    # Served from the catalog cache; only the very first call waits briefly for Ollama
+    models = model_catalog.get(wait=model_catalog.timeout)
+    if models is None:
+        # Return some default models until Ollama answers
+        models = [
+            {"name": "gemma3:12b", "size": "unknown", "raw_size": 0},
+            {"name": "llama3:8b", "size": "unknown", "raw_size": 0},
+            {"name": "mistral:7b", "size": "unknown", "raw_size": 0},
+        ]
+    
+    # Report which models are loaded in memory
+    load_states = model_warmer.states()
+    for model in models:
+        model["state"] = load_states.get(model["name"], {}).get("state", "unloaded")
+        model["loaded"] = model["state"] == "loaded"
+    
+    payload = {"models": models}
+    etag = compute_etag(payload)
+    if etag_matches(etag, request.headers.get('If-None-Match')):
+        response = Response(status=304)
+    else:
+        response = jsonify(payload)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/debug/model-catalog', methods=['GET'])
+def model_catalog_diagnostics():
+    """Get model catalog refresh counters"""
+    return jsonify(model_catalog.stats())
 
 @app.route('/api/model', methods=['POST'])
 def set_model():
@@ -1005,16 +1432,21 @@ def set_model():
     
     try:
         # Create a new provider with the selected model
-        provider = ProviderFactory.create_provider("ollama", model=model_name)
+        provider = ProviderFactory.create_provider("ollama", model=model_name, keep_alive=OLLAMA_KEEP_ALIVE)
         
         # Update the session
         session["provider"] = provider
         session["model"] = model_name
         
+        # Load the model now so the next chat does not pay for it, and refresh the catalog
+        model_warmer.warm_up(model_name)
+        model_catalog.invalidate()
+        
         return jsonify({
             "success": True,
             "message": f"Model changed to {model_name}",
-            "model": model_name
+            "model": model_name,
+            "state": model_warmer.state(model_name)
         })
     except Exception as e:
         logger.error(f"Error changing model: {e}")
@@ -1052,9 +1484,21 @@ def get_document_chunks():
     
     return jsonify({"document_name": document_name, "chunks": chunks})
 
+def start_background_services():
+    """Start the chat runtime, memory worker and model catalog poller, and warm up the default model."""
+    chat_runtime.start()
+    memory_worker.start()
+    model_catalog.start()
+    if WARMUP_ON_START:
+        model_warmer.warm_up(DEFAULT_MODEL)
+
 if __name__ == '__main__':
     print("Starting Flask API server on http://localhost:5000")
     
+    # The reloader's parent process only watches files; the child it spawns serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
+    
     # Create a directory for temporary files that won't trigger reload
     temp_dir = os.path.join(tempfile.gettempdir(), "mcp_code_exec")
     os.makedirs(temp_dir, exist_ok=True)
@@ -1066,4 +1510,7 @@ if __name__ == '__main__':
         debug=True,
         use_reloader=True,
         extra_files=[],
-    )
\ No newline at end of file
+    )
+else:
+    # Imported by a WSGI server, which serves from this process
+    start_background_services()
@@ -502,9 +502,12 @@ async def main():
             # Truncate context if needed to fit within token limit
             optimized_context = truncate_context_if_needed(augmented_context)
             
-            # Generate response
+            # Generate response, printing tokens as they arrive
             print("\nAssistant: ", end="")
-            response = await provider.generate_response(optimized_context)
+            response = await provider.generate_response(
+                optimized_context, on_token=lambda token: print(token, end="", flush=True)
+            )
+            print()
             
             # Create assistant message and add to memory
             assistant_message = Message(role=MessageRole.ASSISTANT, content=response)
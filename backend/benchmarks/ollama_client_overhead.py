@@ -0,0 +1,101 @@
+"""
+Measure the per-call overhead of OllamaProvider against a local mock Ollama server.
+
+Compares a fresh httpx.AsyncClient per call (the old behaviour) with the
+provider's pooled keep-alive client. Run from the backend directory:
+
+    python -m benchmarks.ollama_client_overhead
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from mcp.context import Context, MessageRole
+from mcp.providers import OllamaProvider
+
+TOKENS = ["Hello", " from", " the", " mock", " server", "."]
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/chat with a short NDJSON token stream."""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+
+        lines = [
+            json.dumps({"message": {"content": token}, "done": False}) for token in TOKENS
+        ]
+        lines.append(json.dumps({"message": {"content": ""}, "done": True}))
+        body = ("\n".join(lines) + "\n").encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def fresh_client_call(api_url: str, payload: dict) -> str:
+    """One request the way the provider used to make it: a new client per call."""
+    parts = []
+    async with httpx.AsyncClient() as client:
+        async with client.stream("POST", api_url, json=payload, timeout=240.0) as response:
+            async for chunk in response.aiter_lines():
+                if chunk:
+                    parts.append(json.loads(chunk)["message"]["content"])
+    return "".join(parts)
+
+
+async def run_benchmark(base_url: str, calls: int) -> None:
+    provider = OllamaProvider(base_url=base_url, model="mock")
+    context = Context(system_prompt="You are a benchmark.")
+    context.add_message(MessageRole.USER, "Say hello.")
+    payload = {
+        "model": "mock",
+        "messages": context.get_formatted_messages(),
+        "options": {"temperature": context.temperature},
+        "stream": True
+    }
+
+    # Warm up both paths
+    await fresh_client_call(provider.api_url, payload)
+    await provider.generate_response(context)
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        await fresh_client_call(provider.api_url, payload)
+    fresh = (time.perf_counter() - start) / calls
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        await provider.generate_response(context)
+    pooled = (time.perf_counter() - start) / calls
+
+    await provider.aclose()
+
+    print(f"Calls per variant:  {calls}")
+    print(f"Fresh client:       {fresh * 1000:.2f} ms/call")
+    print(f"Pooled client:      {pooled * 1000:.2f} ms/call")
+    print(f"Overhead saved:     {(fresh - pooled) * 1000:.2f} ms/call ({(1 - pooled / fresh) * 100:.0f}%)")
+
+
+def main(calls: int = 200) -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        asyncio.run(run_benchmark(f"http://127.0.0.1:{server.server_port}", calls))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
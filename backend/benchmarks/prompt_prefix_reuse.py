@@ -0,0 +1,148 @@
+"""
+Compare how much of each chat prompt must be re-evaluated per turn under the
+"legacy" and "prefix_stable" prompt layouts.
+
+A backend with a prompt cache (Ollama keeps the KV cache of the previous
+request while the model stays loaded) only evaluates the part of a prompt
+after the prefix it shares with the previous one. Without arguments this
+replays a synthetic conversation and reports the tokens past the shared
+prefix per turn. With --ollama it sends the same prompts to a live server
+and reports the measured prompt_eval_count and prompt_eval_duration.
+Run from the backend directory:
+
+    python -m benchmarks.prompt_prefix_reuse
+    python -m benchmarks.prompt_prefix_reuse --ollama http://localhost:11434 --model gemma3:12b
+"""
+import argparse
+import asyncio
+import random
+from typing import Dict, List
+
+from mcp.context import Context, Message, MessageRole
+from mcp.memory import ConversationMemory
+from mcp.packer import LAYOUTS, PromptChunk, PromptPacker
+from mcp.providers import OllamaProvider
+from mcp.tokens import get_token_counter
+
+SYSTEM_PROMPT = "You are a helpful assistant. Provide clear and concise answers."
+TOPICS = ["revenue", "churn", "pricing", "onboarding", "support tickets", "forecast"]
+
+
+def build_conversation(turns: int, seed: int = 7) -> List[Dict]:
+    """A deterministic conversation: per turn, a question, an answer and the chunks retrieval returns."""
+    rng = random.Random(seed)
+    pool = [
+        PromptChunk(
+            text=f"Section {i} covers {topic}. " + " ".join(f"{topic} detail {i}.{j}" for j in range(40)),
+            header=f"Document: report.pdf\nChunk: {i}/{len(TOPICS) * 3}\n"
+        )
+        for i, topic in enumerate(TOPICS * 3)
+    ]
+    conversation = []
+    for turn in range(turns):
+        topic = rng.choice(TOPICS)
+        conversation.append({
+            "question": f"Turn {turn}: what does the report say about {topic}?",
+            "answer": f"The report discusses {topic} in several sections. " * 6,
+            "chunks": rng.sample(pool, 3)
+        })
+    return conversation
+
+
+def build_prompts(conversation: List[Dict], layout: str, summarize_every: int = 6) -> List[Context]:
+    """Assemble the prompt of every turn the way the chat endpoint does."""
+    memory = ConversationMemory(max_short_term_messages=20)
+    packer = PromptPacker(max_tokens=4000)
+    prompts = []
+    for turn, step in enumerate(conversation):
+        question = step["question"]
+        user_message = Message(role=MessageRole.USER, content=question)
+        memory.add_message(user_message)
+
+        memory_context = memory.get_context_for_query(question)
+        if layout == "prefix_stable":
+            history = memory.get_prompt_history()
+        else:
+            history = [m for m in memory_context if m.metadata.get("source") not in ("long_term_memory", "summary")]
+
+        packed = packer.pack(
+            question=question,
+            system_prompt=SYSTEM_PROMPT,
+            documents_preamble=f"You have access to the following documents that may be relevant to the user's question: \"{question}\"\n\n",
+            recent_messages=[m for m in history if m is not user_message],
+            chunks=step["chunks"],
+            summary=next((m for m in memory_context if m.metadata.get("source") == "summary"), None),
+            layout=layout
+        )
+        prompts.append(packed.context)
+
+        memory.add_message(Message(role=MessageRole.ASSISTANT, content=step["answer"]))
+        if (turn + 1) % summarize_every == 0:
+            memory.add_summary(f"The user has asked about the report through turn {turn}.")
+    return prompts
+
+
+def render(context: Context) -> str:
+    """Flatten a prompt roughly the way a chat template does."""
+    return "".join(f"<{m['role']}>{m['content']}</{m['role']}>" for m in context.get_formatted_messages())
+
+
+def simulate(prompts: List[Context]) -> Dict[str, float]:
+    """Tokens past the prefix shared with the previous prompt, averaged over turns."""
+    counter = get_token_counter()
+    previous = ""
+    total_tokens = 0
+    evaluated_tokens = 0
+    for context in prompts:
+        text = render(context)
+        shared = 0
+        for a, b in zip(previous, text):
+            if a != b:
+                break
+            shared += 1
+        total_tokens += counter.count(text)
+        evaluated_tokens += counter.count(text[shared:])
+        previous = text
+    return {
+        "prompt_tokens": total_tokens / len(prompts),
+        "evaluated_tokens": evaluated_tokens / len(prompts)
+    }
+
+
+async def measure(prompts: List[Context], base_url: str, model: str) -> Dict[str, float]:
+    """Send the prompts to Ollama one after another and average its prompt-eval figures."""
+    provider = OllamaProvider(base_url=base_url, model=model, keep_alive="10m")
+    counts, durations = [], []
+    for context in prompts:
+        usage = {}
+        async for chunk in provider.stream_response(context):
+            if chunk.done:
+                usage = chunk.usage
+        counts.append(usage.get("prompt_eval_count", 0))
+        durations.append(usage.get("prompt_eval_duration", 0) / 1e6)
+    await provider.aclose()
+    return {
+        "prompt_eval_count": sum(counts) / len(counts),
+        "prompt_eval_ms": sum(durations) / len(durations)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=24)
+    parser.add_argument("--ollama", help="Ollama base URL; simulate when omitted")
+    parser.add_argument("--model", default="gemma3:12b")
+    args = parser.parse_args()
+
+    conversation = build_conversation(args.turns)
+    for layout in LAYOUTS:
+        prompts = build_prompts(conversation, layout)
+        if args.ollama:
+            result = asyncio.run(measure(prompts, args.ollama, args.model))
+        else:
+            result = simulate(prompts)
+        print(f"{layout:>14}: " + ", ".join(f"{key} {value:.1f}/turn" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
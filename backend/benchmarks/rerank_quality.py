@@ -0,0 +1,127 @@
+"""
+Compare retrieval quality per prompt token with and without a second-stage reranker.
+
+Builds a synthetic corpus of report chunks that differ only in their
+specifics (region, quarter, metric), the case where first-stage vector
+ranking is weakest, and asks one question per chunk. For every reranker
+and every number of kept chunks k it reports recall@k (the chunk that
+answers the question is in the prompt), the prompt tokens spent on the
+kept chunks, recall per 1000 of those tokens, and the rerank latency.
+Run from the backend directory:
+
+    python -m benchmarks.rerank_quality
+    python -m benchmarks.rerank_quality --embedding sentence-transformer --rerankers none lexical cross-encoder
+"""
+import argparse
+import hashlib
+import random
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from mcp.packer import PromptChunk, PromptPacker
+from mcp.tokens import get_token_counter
+from retrieval.embeddings import Embedding, EmbeddingGenerator, get_embedding_generator
+from retrieval.vectordb import InMemoryVectorDB
+from retrieval_enhancement.rerank import get_reranker
+
+REGIONS = ["north", "south", "east", "west", "central", "coastal"]
+QUARTERS = ["Q1", "Q2", "Q3", "Q4"]
+METRICS = ["revenue", "churn", "headcount", "support backlog", "marketing spend"]
+
+
+class HashingEmbedding(EmbeddingGenerator):
+    """Hashed character-trigram vectors: a cheap stand-in for a small dense model."""
+
+    def __init__(self, vector_size: int = 384):
+        """Initialize the embedding generator."""
+        self.vector_size = vector_size
+
+    def generate(self, texts: List[str], metadata: List[Dict[str, Any]] = None) -> List[Embedding]:
+        """Generate embeddings for a list of texts."""
+        result = []
+        for i, text in enumerate(texts):
+            vector = np.zeros(self.vector_size)
+            padded = f"  {text.lower()}  "
+            for j in range(len(padded) - 2):
+                digest = hashlib.blake2b(padded[j:j + 3].encode("utf-8"), digest_size=4).digest()
+                vector[int.from_bytes(digest, "little") % self.vector_size] += 1.0
+            meta = metadata[i] if metadata and i < len(metadata) else {}
+            result.append(Embedding(text=text, vector=vector.tolist(), metadata=meta))
+        return result
+
+
+def build_corpus(seed: int = 11) -> List[Dict[str, Any]]:
+    """One chunk per (metric, region, quarter), each with the question it answers."""
+    rng = random.Random(seed)
+    corpus = []
+    for metric in METRICS:
+        for region in REGIONS:
+            for quarter in QUARTERS:
+                value = rng.randint(10, 990)
+                text = (
+                    f"Regional report, {quarter}. In the {region} region the {metric} came to {value} "
+                    f"units. Management notes that {metric} figures are reviewed every quarter and "
+                    f"compared across regions before the board meeting."
+                )
+                question = f"What was the {metric} in the {region} region in {quarter}?"
+                corpus.append({"text": text, "question": question})
+    return corpus
+
+
+def evaluate(corpus: List[Dict[str, Any]], embedding_type: str, rerankers: List[str], ks: List[int], candidates: int) -> None:
+    """Print recall@k, prompt tokens and recall per 1000 prompt tokens for every reranker and k."""
+    embedding_generator = HashingEmbedding() if embedding_type == "hashing" else get_embedding_generator(embedding_type)
+    vector_db = InMemoryVectorDB()
+    vector_db.add_embeddings(embedding_generator.generate(
+        [item["text"] for item in corpus], [{"source": "report.pdf", "chunk": i} for i in range(len(corpus))]
+    ))
+    counter = get_token_counter()
+
+    questions = [item["question"] for item in corpus]
+    result_lists = vector_db.search_many(questions, embedding_generator, top_k=max(candidates, max(ks)))
+
+    for reranker_type in rerankers:
+        reranker = get_reranker(reranker_type)
+        hits = {k: 0 for k in ks}
+        tokens = {k: 0 for k in ks}
+        rerank_seconds = 0.0
+        for item, results in zip(corpus, result_lists):
+            chunks = [
+                PromptChunk(text=result["text"], header=f"Document: report.pdf\nChunk: {result['metadata']['chunk']}\n")
+                for result in results
+            ]
+            if reranker is not None:
+                start = time.perf_counter()
+                chunks = reranker.rerank(item["question"], chunks[:candidates], text=lambda chunk: chunk.text, top_k=max(ks))
+                rerank_seconds += time.perf_counter() - start
+            for k in ks:
+                kept = chunks[:k]
+                hits[k] += any(chunk.text == item["text"] for chunk in kept)
+                tokens[k] += sum(counter.count(PromptPacker.format_chunk(chunk)) for chunk in kept)
+
+        name = reranker.name if reranker is not None else "none"
+        latency = rerank_seconds / len(corpus) * 1000
+        for k in ks:
+            recall = hits[k] / len(corpus)
+            prompt_tokens = tokens[k] / len(corpus)
+            print(
+                f"{name:>14} k={k}: recall {recall:.2f}, {prompt_tokens:.0f} prompt tokens, "
+                f"{recall / prompt_tokens * 1000:.2f} recall/1k tokens, rerank {latency:.2f} ms"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embedding", default="hashing", choices=["hashing", "dummy", "sentence-transformer"])
+    parser.add_argument("--rerankers", nargs="+", default=["none", "lexical"])
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 2, 3, 5])
+    args = parser.parse_args()
+
+    evaluate(build_corpus(), args.embedding, args.rerankers, args.k, args.candidates)
+
+
+if __name__ == "__main__":
+    main()
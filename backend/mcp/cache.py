@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from .context import Context
+from .providers import LLMProvider, StreamChunk
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache for LLM responses keyed by a hash of the request.
+
+    The first tier is a bounded in-memory LRU; the optional second tier is a
+    SQLite file so entries survive restarts. Both tiers honour the same TTL.
+    Every `purge_every` writes, expired rows are deleted from the file and the
+    oldest rows beyond `max_disk_entries` are evicted.
+    Only call sites that opt in (through `wrap`) use the cache.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 24 * 3600,
+        disk_path: Optional[str] = None,
+        max_disk_entries: int = 4096,
+        purge_every: int = 100
+    ):
+        """Initialize the cache. Pass `disk_path` to enable the on-disk tier."""
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.max_disk_entries = max_disk_entries
+        self.purge_every = purge_every
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # key -> (response, stored at)
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "disk_purged": 0}
+        self._writes_since_purge = 0
+
+        self._conn = None
+        if disk_path:
+            try:
+                self._conn = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    "key TEXT PRIMARY KEY, "
+                    "response TEXT NOT NULL, "
+                    "stored_at REAL NOT NULL)"
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_llm_cache_stored_at ON llm_cache (stored_at)"
+                )
+            except Exception as e:
+                logger.error(f"Error opening LLM cache database, using memory only: {e}")
+                self._conn = None
+            else:
+                self.purge_expired()
+
+    @staticmethod
+    def make_key(model: str, context: Context) -> str:
+        """Hash the model, formatted messages, temperature and options of a request."""
+        request = {
+            "model": model,
+            "messages": context.get_formatted_messages(),
+            "temperature": context.temperature,
+            "max_tokens": context.max_tokens
+        }
+        encoded = json.dumps(request, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up a cached response, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, stored_at = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return response
+                del self._memory[key]
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT response, stored_at FROM llm_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                except Exception as e:
+                    logger.error(f"Error reading LLM cache: {e}")
+                    row = None
+
+                if row is not None and now - row[1] <= self.ttl_seconds:
+                    self._remember(key, row[0], row[1])
+                    self._stats["disk_hits"] += 1
+                    return row[0]
+
+            self._stats["misses"] += 1
+            return None
+
+    def peek(self, key: str) -> Optional[str]:
+        """Look up a response in the memory tier without counting a hit or miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and time.time() - entry[1] <= self.ttl_seconds:
+                return entry[0]
+            return None
+
+    def put(self, key: str, response: str) -> None:
+        """Store a response in both tiers."""
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, response, stored_at)
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, response, stored_at) VALUES (?, ?, ?)",
+                        (key, response, stored_at)
+                    )
+                except Exception as e:
+                    logger.error(f"Error writing LLM cache: {e}")
+
+                self._writes_since_purge += 1
+                if self._writes_since_purge >= self.purge_every:
+                    self._purge_locked()
+
+    def purge_expired(self) -> int:
+        """Delete expired rows and the oldest rows beyond `max_disk_entries` from the disk tier. Returns the number removed."""
+        with self._lock:
+            return self._purge_locked()
+
+    def _purge_locked(self) -> int:
+        self._writes_since_purge = 0
+        if self._conn is None:
+            return 0
+        try:
+            removed = max(self._conn.execute(
+                "DELETE FROM llm_cache WHERE stored_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount, 0)
+            removed += max(self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,)
+            ).rowcount, 0)
+        except Exception as e:
+            logger.error(f"Error purging LLM cache: {e}")
+            return 0
+
+        self._stats["disk_purged"] += removed
+        if removed:
+            logger.info(f"Purged {removed} rows from the LLM cache")
+        return removed
+
+    def _remember(self, key: str, response: str, stored_at: float) -> None:
+        self._memory[key] = (response, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def wrap(self, provider: LLMProvider) -> "CachedProvider":
+        """Get a view of `provider` whose responses are served from this cache when possible."""
+        return CachedProvider(provider, self)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit-rate metrics."""
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "max_disk_entries": self.max_disk_entries,
+                "disk_enabled": self._conn is not None
+            }
+
+
+class CachedProvider(LLMProvider):
+    """Provider wrapper that answers repeated requests from an LLMResponseCache."""
+
+    def __init__(self, provider: LLMProvider, cache: LLMResponseCache):
+        self.provider = provider
+        self.cache = cache
+
+    async def stream_response(self, context: Context) -> AsyncIterator[StreamChunk]:
+        """
+        Stream the cached response as a single chunk, or stream from the provider on a miss.
+
+        A streamed response is cached only if the consumer reads it to the end
+        and the backend reported it complete; a stream cut short is never cached.
+        """
+        key = self.cache.make_key(getattr(self.provider, "model", ""), context)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield StreamChunk(delta=cached, done=True, complete=True, usage={"cached": True})
+            return
+
+        parts = []
+        async for chunk in self.provider.stream_response(context):
+            parts.append(chunk.delta)
+            if chunk.done and chunk.complete:
+                response = "".join(parts)
+                if response:
+                    self.cache.put(key, response)
+            yield chunk
+
+    async def generate_response(self, context: Context, on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Return the cached response for this request, generating it on a miss and caching it if complete."""
+        # Goes through stream_response, which sees whether the backend finished the response
+        return await super().generate_response(context, on_token=on_token)
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose the wrapped provider's attributes (model, base_url, ...)
+        return getattr(self.provider, name)
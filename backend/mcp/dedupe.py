@@ -0,0 +1,100 @@
+import hashlib
+import re
+import zlib
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_NON_WORD = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return _WHITESPACE.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+def text_hash(text: str) -> str:
+    """Stable hash of the normalized text, for exact dedupe."""
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class MinHasher:
+    """
+    MinHash signatures over character shingles.
+
+    The fraction of equal signature slots between two texts estimates the
+    Jaccard similarity of their shingle sets.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 4, seed: int = 1):
+        """Initialize `num_perm` hash permutations from a fixed seed, so signatures are stable."""
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """Get the MinHash signature of a text."""
+        normalized = normalize_text(text)
+        size = self.shingle_size
+        if len(normalized) <= size:
+            shingles = {normalized}
+        else:
+            shingles = {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) & 0x7FFFFFFF for shingle in shingles),
+            dtype=np.int64,
+            count=len(shingles)
+        )
+        return ((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME).min(axis=0)
+
+
+class NearDuplicateDetector:
+    """Exact (hash) and near-duplicate (MinHash) detection over a set of stored texts."""
+
+    def __init__(self, threshold: float = 0.8, minhasher: Optional[MinHasher] = None):
+        """Initialize the detector. Texts with estimated Jaccard similarity >= `threshold` are near-duplicates."""
+        self.threshold = threshold
+        self.minhasher = minhasher or MinHasher()
+        self._signatures: Dict[str, np.ndarray] = {}  # text hash -> signature
+        self._texts: Dict[str, str] = {}  # text hash -> stored text
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def find(self, text: str) -> Optional[Tuple[str, str]]:
+        """Get ("exact" or "near", the stored text) if `text` duplicates a stored text, else None."""
+        key = text_hash(text)
+        if key in self._signatures:
+            return "exact", self._texts[key]
+        if not self._signatures:
+            return None
+
+        signature = self.minhasher.signature(text)
+        keys = list(self._signatures)
+        similarities = (np.stack([self._signatures[k] for k in keys]) == signature).mean(axis=1)
+        best = int(similarities.argmax())
+        if float(similarities[best]) >= self.threshold:
+            return "near", self._texts[keys[best]]
+        return None
+
+    def check(self, text: str) -> Optional[str]:
+        """Get "exact" or "near" if `text` duplicates a stored text, else None."""
+        match = self.find(text)
+        return match[0] if match else None
+
+    def add(self, text: str) -> None:
+        """Remember a stored text."""
+        key = text_hash(text)
+        if key not in self._signatures:
+            self._signatures[key] = self.minhasher.signature(text)
+            self._texts[key] = text
+
+    def remove(self, text: str) -> None:
+        """Forget a stored text."""
+        key = text_hash(text)
+        self._signatures.pop(key, None)
+        self._texts.pop(key, None)
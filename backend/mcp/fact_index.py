@@ -0,0 +1,82 @@
+import threading
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+
+class FactVectorIndex:
+    """
+    Small per-session vector index over long-term memory facts.
+
+    Each fact is embedded once, when it is stored, with the configured
+    embedding generator (anything with the `EmbeddingGenerator.generate`
+    interface). Vectors are kept L2-normalized in one matrix, so a search is
+    a single matrix-vector product. Facts are written from the memory worker
+    and read on the chat path, hence the lock.
+    """
+
+    def __init__(self, embedding_generator: Any):
+        """Initialize an empty index that embeds with `embedding_generator`."""
+        self.embedding_generator = embedding_generator
+        self._lock = threading.Lock()
+        self._facts: List[Tuple[str, str]] = []  # (topic, fact) per matrix row
+        self._vectors: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._facts)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def embed(self, facts: List[str]) -> np.ndarray:
+        """Get the normalized vectors of facts, one row per fact."""
+        embeddings = self.embedding_generator.generate(facts)
+        return self._normalize(np.asarray([e.vector for e in embeddings], dtype=np.float32))
+
+    def add(self, topic: str, facts: List[str], vectors: Optional[np.ndarray] = None) -> None:
+        """Store facts filed under `topic`, embedding them unless their `vectors` (from `embed`) are given."""
+        if not facts:
+            return
+        if vectors is None:
+            vectors = self.embed(facts)
+
+        with self._lock:
+            self._facts.extend((topic, fact) for fact in facts)
+            self._vectors = vectors if self._vectors is None else np.vstack([self._vectors, vectors])
+
+    def remove(self, topic: str, fact: str) -> None:
+        """Drop a stored fact, if present."""
+        with self._lock:
+            try:
+                row = self._facts.index((topic, fact))
+            except ValueError:
+                return
+            del self._facts[row]
+            self._vectors = np.delete(self._vectors, row, axis=0) if self._facts else None
+
+    def search(self, query: str, top_k: int = 5, min_similarity: float = 0.0) -> List[Tuple[str, str, float]]:
+        """Get up to `top_k` (topic, fact, similarity) triples at or above `min_similarity`, best first."""
+        with self._lock:
+            if not self._facts or top_k <= 0:
+                return []
+            facts = list(self._facts)
+            vectors = self._vectors
+
+        embeddings = self.embedding_generator.generate([query])
+        if not embeddings:
+            return []
+        query_vector = self._normalize(np.asarray([embeddings[0].vector], dtype=np.float32))[0]
+
+        similarities = vectors @ query_vector
+        k = min(top_k, len(facts))
+        candidates = np.argpartition(-similarities, k - 1)[:k]
+        candidates = candidates[np.argsort(-similarities[candidates])]
+
+        return [
+            (facts[i][0], facts[i][1], float(similarities[i]))
+            for i in candidates
+            if similarities[i] >= min_similarity
+        ]
@@ -1,67 +1,417 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Deque
+from collections import deque
+from itertools import count, islice
 import json
 import logging
+import threading
 import traceback
 from mcp.context import MessageRole, Message
+from mcp.dedupe import NearDuplicateDetector
+from mcp.fact_index import FactVectorIndex
+from mcp.topic_index import TopicMatcher
+from mcp.tokens import count_message_tokens
+from mcp.utils import estimate_token_count
 
 logger = logging.getLogger(__name__)
 
 class ConversationMemory:
-    """Manages conversation history with short-term and long-term memory."""
+    """
+    Manages conversation history with short-term and long-term memory.
+    
+    The chat runtime, the memory maintenance worker and retrieval threads all
+    use the same instance, so every public method holds a re-entrant lock.
+    Read the message deques and stores through the snapshot methods rather
+    than iterating the attributes directly.
+    """
     
-    def __init__(self, max_short_term_messages: int = 10):
-        """Initialize memory storage."""
-        self.short_term_memory: List[Message] = []  # Recent messages
+    def __init__(
+        self,
+        max_short_term_messages: int = 10,
+        max_facts_per_query: int = 10,
+        embedding_generator: Any = None,
+        semantic_top_k: int = 5,
+        semantic_min_similarity: float = 0.3,
+        max_fact_tokens: int = 300,
+        max_facts_per_topic: int = 20,
+        max_total_facts: int = 200,
+        max_summaries: int = 5,
+        near_duplicate_threshold: float = 0.8,
+        compact_every: int = 50
+    ):
+        """
+        Initialize memory storage.
+        
+        Pass `embedding_generator` to also index long-term facts by embedding;
+        queries can then retrieve the top-k most similar facts instead of
+        matching topic names.
+        
+        Long-term memory is bounded: exact duplicates are rejected, a near
+        duplicate replaces the older fact under its topic, the oldest facts
+        are evicted past the per-topic and total caps, and every
+        `compact_every` writes old summaries are dropped.
+        """
+        self.short_term_memory: Deque[Message] = deque(maxlen=max_short_term_messages)  # Recent messages
         self.long_term_memory: Dict[str, List[str]] = {}  # Important information by topic
         self.summaries: List[str] = []  # Periodic summaries of conversation
         self.max_short_term_messages = max_short_term_messages
+        self._lock = threading.RLock()
+        self.max_facts_per_query = max_facts_per_query
+        self.topic_matcher = TopicMatcher()  # Finds long-term topics mentioned in a query
+        
+        # Optional semantic retrieval of long-term facts
+        self.fact_index = FactVectorIndex(embedding_generator) if embedding_generator is not None else None
+        self.semantic_top_k = semantic_top_k
+        self.semantic_min_similarity = semantic_min_similarity
+        self.max_fact_tokens = max_fact_tokens
+        
+        # Bounds on long-term memory
+        self.max_facts_per_topic = max_facts_per_topic
+        self.max_total_facts = max_total_facts
+        self.max_summaries = max_summaries
+        self.compact_every = compact_every
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.duplicate_detectors: Dict[str, NearDuplicateDetector] = {}  # Per topic
+        self.fact_order: Deque[tuple] = deque()  # (topic, fact), oldest first
+        self._writes_since_compaction = 0
+        self.compaction_stats = {
+            "exact_duplicates": 0,
+            "near_duplicates": 0,
+            "evicted_facts": 0,
+            "replaced_facts": 0,  # Older near-duplicates superseded by a newer fact
+            "compacted_summaries": 0,
+            "compactions": 0,
+            "bytes_reclaimed": 0,  # Freed from stored facts and summaries
+            "duplicates_rejected_bytes": 0  # Duplicate facts turned away before being stored
+        }
+        
+        # Messages not yet folded into a summary, for incremental summarization; each message
+        # is tagged with a sequence number so a summary removes exactly the messages it covers
+        self.unsummarized_messages: Deque[Message] = deque()
+        self._sequence = count()
+        self._summary_sequence = 0  # First sequence number after the messages the latest summary covers
+        self.unsummarized_tokens = 0
+        self.prompt_tokens_saved = 0  # Saved by incremental memory maintenance so far
     
     def add_message(self, message: Message) -> None:
         """Add a message to short-term memory."""
-        self.short_term_memory.append(message)
+        with self._lock:
+            message.metadata["memory_sequence"] = next(self._sequence)
+            
+            # The deque drops the oldest message once it exceeds max length
+            self.short_term_memory.append(message)
+            
+            self.unsummarized_messages.append(message)
+            self.unsummarized_tokens += count_message_tokens(message)
+            
+            # Messages that pile up without ever being summarized are dropped oldest first
+            while len(self.unsummarized_messages) > self.max_short_term_messages * 2:
+                dropped = self.unsummarized_messages.popleft()
+                self.unsummarized_tokens -= count_message_tokens(dropped)
+    
+    def add_to_long_term(self, topic: str, information: str) -> bool:
+        """
+        Add information to long-term memory under a specific topic.
         
-        # Trim if exceeds max length
-        if len(self.short_term_memory) > self.max_short_term_messages:
-            self.short_term_memory.pop(0)
+        A near-duplicate of a fact stored under the same topic is taken as a
+        correction: the older fact is replaced by the new one. Returns False
+        if the information exactly duplicates a fact stored under the topic.
+        """
+        # Embed before taking the lock, which the chat loop also waits on
+        vectors = None
+        if self.fact_index is not None:
+            try:
+                vectors = self.fact_index.embed([information])
+            except Exception as e:
+                logger.error(f"Error embedding fact for topic {topic}: {e}")
+        
+        with self._lock:
+            detector = self.duplicate_detectors.get(topic)
+            duplicate = detector.find(information) if detector is not None else None
+            if duplicate:
+                kind, stored = duplicate
+                self.compaction_stats[f"{kind}_duplicates"] += 1
+                if kind == "exact":
+                    self.compaction_stats["duplicates_rejected_bytes"] += len(information.encode("utf-8"))
+                    return False
+                self._remove_fact(topic, stored, stat="replaced_facts")
+            
+            if topic not in self.long_term_memory:
+                self.long_term_memory[topic] = []
+                self.duplicate_detectors[topic] = NearDuplicateDetector(threshold=self.near_duplicate_threshold)
+                self.topic_matcher.add(topic)
+            self.long_term_memory[topic].append(information)
+            self.fact_order.append((topic, information))
+            self.duplicate_detectors[topic].add(information)
+            
+            if vectors is not None:
+                self.fact_index.add(topic, [information], vectors=vectors)
+            
+            self._enforce_fact_caps()
+            self._count_write()
+            return True
     
-    def add_to_long_term(self, topic: str, information: str) -> None:
-        """Add information to long-term memory under a specific topic."""
-        if topic not in self.long_term_memory:
-            self.long_term_memory[topic] = []
-        self.long_term_memory[topic].append(information)
+    def _remove_fact(self, topic: str, information: str, stat: str = "evicted_facts") -> None:
+        """Remove one stored fact from every index, counting it under `stat`."""
+        facts = self.long_term_memory.get(topic)
+        if not facts or information not in facts:
+            return
+        facts.remove(information)
+        self.duplicate_detectors[topic].remove(information)
+        if not facts:
+            del self.long_term_memory[topic]
+            del self.duplicate_detectors[topic]
+        try:
+            self.fact_order.remove((topic, information))
+        except ValueError:
+            pass
+        if self.fact_index is not None:
+            self.fact_index.remove(topic, information)
+        
+        self.compaction_stats[stat] += 1
+        self.compaction_stats["bytes_reclaimed"] += len(information.encode("utf-8"))
+    
+    def _enforce_fact_caps(self) -> None:
+        """Evict the oldest facts beyond the per-topic and total caps."""
+        for topic in [t for t, facts in self.long_term_memory.items() if len(facts) > self.max_facts_per_topic]:
+            facts = self.long_term_memory[topic]
+            for information in facts[:len(facts) - self.max_facts_per_topic]:
+                self._remove_fact(topic, information)
+        
+        while len(self.fact_order) > self.max_total_facts:
+            topic, information = self.fact_order[0]
+            self._remove_fact(topic, information)
+    
+    def _count_write(self) -> None:
+        self._writes_since_compaction += 1
+        if self._writes_since_compaction >= self.compact_every:
+            self.compact()
+    
+    def compact(self) -> int:
+        """Drop summaries older than the last `max_summaries` and re-apply fact caps. Returns bytes reclaimed."""
+        with self._lock:
+            reclaimed_before = self.compaction_stats["bytes_reclaimed"]
+            
+            excess = len(self.summaries) - self.max_summaries
+            if excess > 0:
+                dropped = self.summaries[:excess]
+                del self.summaries[:excess]
+                self.compaction_stats["compacted_summaries"] += excess
+                self.compaction_stats["bytes_reclaimed"] += sum(len(s.encode("utf-8")) for s in dropped)
+            
+            self._enforce_fact_caps()
+            
+            self._writes_since_compaction = 0
+            self.compaction_stats["compactions"] += 1
+            reclaimed = self.compaction_stats["bytes_reclaimed"] - reclaimed_before
+            if reclaimed:
+                logger.info(f"Compacted conversation memory, reclaimed {reclaimed} bytes")
+            return reclaimed
+    
+    def add_summary(self, summary: str, covered_messages: Optional[List[Message]] = None) -> None:
+        """
+        Add a conversation summary to memory.
+        
+        `covered_messages` are the unsummarized messages the summary includes,
+        as snapshotted before it was generated; only those are removed, even if
+        other messages were added or dropped meanwhile. By default it covers all of them.
+        """
+        with self._lock:
+            self.summaries.append(summary)
+            
+            if covered_messages is None:
+                covered = None
+                self._summary_sequence = max(
+                    (message.metadata["memory_sequence"] + 1 for message in self.unsummarized_messages),
+                    default=self._summary_sequence
+                )
+            else:
+                covered = {message.metadata.get("memory_sequence") for message in covered_messages}
+                self._summary_sequence = max(
+                    (sequence + 1 for sequence in covered if sequence is not None),
+                    default=self._summary_sequence
+                )
+            remaining = deque()
+            for message in self.unsummarized_messages:
+                if covered is None or message.metadata.get("memory_sequence") in covered:
+                    self.unsummarized_tokens -= count_message_tokens(message)
+                else:
+                    remaining.append(message)
+            self.unsummarized_messages = remaining
+            
+            self._count_write()
     
-    def add_summary(self, summary: str) -> None:
-        """Add a conversation summary to memory."""
-        self.summaries.append(summary)
+    def get_latest_summary(self) -> Optional[str]:
+        """Get the most recent summary, if any."""
+        with self._lock:
+            return self.summaries[-1] if self.summaries else None
     
     def get_recent_messages(self, count: int = 5) -> List[Message]:
         """Get the most recent messages from short-term memory."""
-        return self.short_term_memory[-count:] if self.short_term_memory else []
+        with self._lock:
+            start = max(len(self.short_term_memory) - count, 0)
+            return list(islice(self.short_term_memory, start, None))
+    
+    def get_short_term_messages(self) -> List[Message]:
+        """Get a snapshot of short-term memory, oldest first."""
+        with self._lock:
+            return list(self.short_term_memory)
     
-    def get_context_for_query(self, query: str) -> List[Message]:
-        """Get relevant context for a query from both short and long-term memory."""
+    def get_unsummarized_messages(self) -> List[Message]:
+        """Get a snapshot of the messages not yet folded into a summary, oldest first."""
+        with self._lock:
+            return list(self.unsummarized_messages)
+    
+    def get_prompt_history(self, min_recent: int = 5) -> List[Message]:
+        """
+        Get the history to send verbatim after the latest summary, oldest first.
+        
+        That is every message not yet summarized plus the last `min_recent`
+        messages the summary covers, so a question right after a summary
+        still has the turn it refers to. The window starts from where the
+        summary ends rather than from the newest message, so between
+        summaries the history only grows and the prompt prefix stays stable.
+        """
+        with self._lock:
+            messages = list(self.short_term_memory)
+            unsummarized = {message.metadata.get("memory_sequence") for message in self.unsummarized_messages}
+            boundary = next(
+                (i for i, message in enumerate(messages) if message.metadata["memory_sequence"] >= self._summary_sequence),
+                len(messages)
+            )
+            first_unsummarized = next(
+                (i for i, message in enumerate(messages) if message.metadata["memory_sequence"] in unsummarized),
+                len(messages)
+            )
+            start = min(max(boundary - min_recent, 0), first_unsummarized)
+            return messages[start:]
+    
+    def add_prompt_tokens_saved(self, tokens: int) -> int:
+        """Record prompt tokens saved by incremental maintenance. Returns the session total."""
+        with self._lock:
+            self.prompt_tokens_saved += tokens
+            return self.prompt_tokens_saved
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get a consistent snapshot of the memory contents and counters."""
+        with self._lock:
+            return {
+                "short_term_count": len(self.short_term_memory),
+                "long_term_facts": {topic: list(facts) for topic, facts in self.long_term_memory.items()},
+                "summaries_count": len(self.summaries),
+                "latest_summary": self.summaries[-1] if self.summaries else None,
+                "prompt_tokens_saved": self.prompt_tokens_saved,
+                "compaction": dict(self.compaction_stats)
+            }
+    
+    def get_relevant_facts(self, query: str, max_facts: Optional[int] = None) -> List[tuple]:
+        """
+        Get (topic, fact) pairs for the long-term topics mentioned in a query.
+        
+        Matched topics take turns contributing their newest facts until
+        `max_facts` (default: `max_facts_per_query`) is reached.
+        """
+        with self._lock:
+            if max_facts is None:
+                max_facts = self.max_facts_per_query
+            
+            fact_lists = [
+                (topic, self.long_term_memory[topic][::-1])
+                for topic in self.topic_matcher.find(query)
+                if self.long_term_memory.get(topic)
+            ]
+            
+            selected = []
+            depth = 0
+            while len(selected) < max_facts and any(depth < len(facts) for _, facts in fact_lists):
+                for topic, facts in fact_lists:
+                    if depth < len(facts) and len(selected) < max_facts:
+                        selected.append((topic, facts[depth]))
+                depth += 1
+            return selected
+    
+    def get_similar_facts(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        min_similarity: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> List[tuple]:
+        """
+        Get (topic, fact, similarity) triples for the facts most similar to a query.
+        
+        Facts below the similarity floor are skipped, and facts are taken best
+        first only while they fit within the token cap.
+        """
+        if self.fact_index is None:
+            return []
+        if top_k is None:
+            top_k = self.semantic_top_k
+        if min_similarity is None:
+            min_similarity = self.semantic_min_similarity
+        if max_tokens is None:
+            max_tokens = self.max_fact_tokens
+        
+        try:
+            matches = self.fact_index.search(query, top_k=top_k, min_similarity=min_similarity)
+        except Exception as e:
+            logger.error(f"Error searching long-term facts: {e}")
+            return []
+        
+        selected = []
+        used_tokens = 0
+        for topic, fact, similarity in matches:
+            fact_tokens = estimate_token_count(fact)
+            if used_tokens + fact_tokens > max_tokens:
+                continue
+            selected.append((topic, fact, similarity))
+            used_tokens += fact_tokens
+        return selected
+    
+    def get_context_for_query(
+        self,
+        query: str,
+        max_facts: Optional[int] = None,
+        semantic: Optional[bool] = None
+    ) -> List[Message]:
+        """
+        Get relevant context for a query from both short and long-term memory.
+        
+        With `semantic` (the default when facts are embedded), long-term facts
+        are chosen by embedding similarity; otherwise by topic names in the query.
+        """
         # Always include recent messages
         context = self.get_recent_messages()
         
+        if semantic is None:
+            semantic = self.fact_index is not None
+        
         # Include relevant information from long-term memory
-        relevant_info = []
-        for topic, info_list in self.long_term_memory.items():
-            if topic.lower() in query.lower():
-                for info in info_list:
-                    relevant_info.append(
-                        Message(
-                            role=MessageRole.SYSTEM,
-                            content=f"Related information about {topic}: {info}",
-                            metadata={"source": "long_term_memory", "topic": topic}
-                        )
-                    )
+        if semantic:
+            relevant_info = [
+                Message(
+                    role=MessageRole.SYSTEM,
+                    content=f"Related information about {topic}: {info}",
+                    metadata={"source": "long_term_memory", "topic": topic, "similarity": round(similarity, 4)}
+                )
+                for topic, info, similarity in self.get_similar_facts(query, top_k=max_facts)
+            ]
+        else:
+            relevant_info = [
+                Message(
+                    role=MessageRole.SYSTEM,
+                    content=f"Related information about {topic}: {info}",
+                    metadata={"source": "long_term_memory", "topic": topic}
+                )
+                for topic, info in self.get_relevant_facts(query, max_facts)
+            ]
         
         # Include most recent summary if available
-        if self.summaries:
+        latest_summary = self.get_latest_summary()
+        if latest_summary:
             context.append(
                 Message(
                     role=MessageRole.SYSTEM,
-                    content=f"Conversation summary: {self.summaries[-1]}",
+                    content=f"Conversation summary: {latest_summary}",
                     metadata={"source": "summary"}
                 )
             )
@@ -86,39 +436,122 @@ class ConversationMemory:
         return extracted_info
 
 
-async def generate_conversation_summary(provider, messages: List[Message]) -> str:
-    """Generate a summary of the conversation."""
+SUMMARY_PROMPT = (
+    "You are a conversation summarizer. Create a concise summary of the "
+    "following conversation, focusing on key points, decisions, and important information. "
+    "Highlight any facts or data that should be remembered for future reference. "
+    "Keep your summary under 200 words."
+)
+
+INCREMENTAL_SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation. You are given the previous summary "
+    "and the messages exchanged since it was written. Return an updated summary that keeps "
+    "the key points, decisions, and important information from the previous summary and adds "
+    "what is new. Highlight any facts or data that should be remembered for future reference. "
+    "Keep your summary under 200 words."
+)
+
+FACT_EXTRACTION_PROMPT = (
+    "You are a fact extraction specialist. Your task is to identify important facts, "
+    "data points, or information from the given message that should be remembered for "
+    "future reference. Return your response in JSON format like this:\n"
+    "{\n"
+    "  \"topic1\": [\"fact1\", \"fact2\"],\n"
+    "  \"topic2\": [\"fact3\"]\n"
+    "}\n"
+    "Only include truly important information. If no important facts are present, return an empty JSON object {}."
+    "IMPORTANT: Return ONLY the raw JSON without any markdown formatting, code blocks, or explanations."
+)
+
+TURN_FACT_EXTRACTION_PROMPT = (
+    "You are a fact extraction specialist. Your task is to identify important facts, "
+    "data points, or information from an exchange between a user and an assistant that "
+    "should be remembered for future reference. Consider both messages. Return your response "
+    "in JSON format like this:\n"
+    "{\n"
+    "  \"topic1\": [\"fact1\", \"fact2\"],\n"
+    "  \"topic2\": [\"fact3\"]\n"
+    "}\n"
+    "Only include truly important information. If no important facts are present, return an empty JSON object {}."
+    "IMPORTANT: Return ONLY the raw JSON without any markdown formatting, code blocks, or explanations."
+)
+
+
+def format_conversation(messages: List[Message]) -> str:
+    """Format messages as 'role: content' lines."""
+    return "\n".join([
+        f"{msg.role.value}: {msg.content}" for msg in messages
+    ])
+
+
+def build_summary_context(messages: List[Message]):
+    """Build the prompt that summarizes a whole conversation."""
     from mcp.context import Context
     
-    logger.info(f"Generating summary from {len(messages)} messages...")
-    
-    if not messages:
-        logger.warning("No messages to summarize")
-        return "No conversation to summarize yet."
-    
-    # Create a specialized system prompt for summarization
-    summary_prompt = (
-        "You are a conversation summarizer. Create a concise summary of the "
-        "following conversation, focusing on key points, decisions, and important information. "
-        "Highlight any facts or data that should be remembered for future reference. "
-        "Keep your summary under 200 words."
+    context = Context(system_prompt=SUMMARY_PROMPT)
+    context.add_message(
+        MessageRole.USER,
+        f"Please summarize this conversation:\n\n{format_conversation(messages)}"
     )
+    return context
+
+
+def build_incremental_summary_context(previous_summary: Optional[str], new_messages: List[Message]):
+    """Build the prompt that folds new messages into the previous summary."""
+    from mcp.context import Context
     
-    # Format the conversation messages
-    conversation_text = "\n".join([
-        f"{msg.role.value}: {msg.content}" for msg in messages
-    ])
-    
-    logger.info(f"Conversation text length: {len(conversation_text)} characters")
+    context = Context(system_prompt=INCREMENTAL_SUMMARY_PROMPT)
+    context.add_message(
+        MessageRole.USER,
+        f"Previous summary:\n{previous_summary or '(none yet)'}\n\n"
+        f"New messages:\n\n{format_conversation(new_messages)}"
+    )
+    return context
+
+
+def build_fact_extraction_context(message: Message):
+    """Build the prompt that extracts facts from a single message."""
+    from mcp.context import Context
     
-    # Create context with the specialized system prompt
-    context = Context(system_prompt=summary_prompt)
+    context = Context(system_prompt=FACT_EXTRACTION_PROMPT)
+    context.add_message(
+        MessageRole.USER,
+        f"Extract important facts from this message:\n\n{message.content}"
+    )
+    return context
+
+
+def build_turn_fact_extraction_context(user_message: Message, assistant_message: Message):
+    """Build the prompt that extracts facts from a user/assistant turn in one call."""
+    from mcp.context import Context
     
-    # Add the conversation text as a user message
+    context = Context(system_prompt=TURN_FACT_EXTRACTION_PROMPT)
     context.add_message(
         MessageRole.USER,
-        f"Please summarize this conversation:\n\n{conversation_text}"
+        f"Extract important facts from this exchange:\n\n"
+        f"user: {user_message.content}\n\n"
+        f"assistant: {assistant_message.content}"
     )
+    return context
+
+
+def estimate_prompt_tokens(context) -> int:
+    """Estimate the prompt tokens a context sends to the LLM."""
+    return sum(
+        estimate_token_count(message["content"]) for message in context.get_formatted_messages()
+    )
+
+
+async def generate_conversation_summary(provider, messages: List[Message]) -> str:
+    """Generate a summary of the conversation."""
+    logger.info(f"Generating summary from {len(messages)} messages...")
+    
+    if not messages:
+        logger.warning("No messages to summarize")
+        return "No conversation to summarize yet."
+    
+    # Create context with the specialized system prompt
+    context = build_summary_context(messages)
     
     try:
         # Generate the summary
@@ -131,93 +564,117 @@ async def generate_conversation_summary(provider, messages: List[Message]) -> st
         return "Error generating summary."
 
 
+async def generate_incremental_summary(provider, previous_summary: Optional[str], new_messages: List[Message]) -> Optional[str]:
+    """
+    Update the previous summary with only the messages added since it was written.
+    
+    Returns None if the summary could not be generated.
+    """
+    logger.info(f"Updating summary with {len(new_messages)} new messages...")
+    
+    if not new_messages:
+        return previous_summary
+    
+    context = build_incremental_summary_context(previous_summary, new_messages)
+    
+    try:
+        summary = await provider.generate_response(context)
+        logger.info(f"Updated summary: {summary[:100]}...")
+        return summary
+    except Exception as e:
+        logger.error(f"Error updating summary: {e}")
+        logger.error(traceback.format_exc())
+        return None
+
+
 async def extract_key_facts(provider, message: Message) -> Dict[str, List[str]]:
     """
     Use the LLM to extract key facts from a message that should be stored in long-term memory.
     """
-    from mcp.context import Context
-    
     logger.info(f"Extracting facts from message: {message.content[:100]}...")
     
-    # Create a specialized system prompt for fact extraction
-    extraction_prompt = (
-        "You are a fact extraction specialist. Your task is to identify important facts, "
-        "data points, or information from the given message that should be remembered for "
-        "future reference. Return your response in JSON format like this:\n"
-        "{\n"
-        "  \"topic1\": [\"fact1\", \"fact2\"],\n"
-        "  \"topic2\": [\"fact3\"]\n"
-        "}\n"
-        "Only include truly important information. If no important facts are present, return an empty JSON object {}."
-        "IMPORTANT: Return ONLY the raw JSON without any markdown formatting, code blocks, or explanations."
-    )
-    
     # Create context with the specialized system prompt
-    context = Context(system_prompt=extraction_prompt)
-    
-    # Add the message content to extract facts from
-    context.add_message(
-        MessageRole.USER,
-        f"Extract important facts from this message:\n\n{message.content}"
-    )
+    context = build_fact_extraction_context(message)
     
     try:
         # Generate the extraction
         extraction_result = await provider.generate_response(context)
-        logger.info(f"Raw extraction result length: {len(extraction_result)}")
-        
-        # Clean up the result
-        cleaned_result = extraction_result.strip()
-        
-        # Handle <think> tags if present
-        if "<think>" in cleaned_result and "</think>" in cleaned_result:
-            think_end = cleaned_result.rfind("</think>")
-            if think_end > 0:
-                cleaned_result = cleaned_result[think_end + 8:].strip()
-                logger.info(f"Removed <think> tags, remaining: {len(cleaned_result)} chars")
-        
-        # Handle markdown code blocks
-        if "```" in cleaned_result:
-            # Find the code block
-            start_block = cleaned_result.find("```")
-            end_block = cleaned_result.rfind("```")
-            
-            if start_block >= 0 and end_block > start_block:
-                # Extract content between code blocks
-                # Skip language specifier if present (```json)
-                content_start = cleaned_result.find("\n", start_block) + 1
-                if content_start > 0:
-                    cleaned_result = cleaned_result[content_start:end_block].strip()
-                    logger.info(f"Extracted from code block, content: {len(cleaned_result)} chars")
-        
-        logger.info(f"Cleaned extraction result: {cleaned_result[:100]}...")
-        
-        # Parse the JSON response
-        try:
-            facts = json.loads(cleaned_result)
-            logger.info(f"Successfully parsed facts: {len(facts)} topics")
-            return facts
-        except json.JSONDecodeError as e:
-            logger.error(f"Error parsing fact extraction result: {e}")
-            logger.error(f"Problem string: '{cleaned_result}'")
-            
-            # Try to fix common JSON issues
-            try:
-                # Try to find a valid JSON object in the string
-                import re
-                json_pattern = r'\{.*\}'
-                match = re.search(json_pattern, cleaned_result, re.DOTALL)
-                if match:
-                    potential_json = match.group(0)
-                    facts = json.loads(potential_json)
-                    logger.info(f"Successfully extracted JSON using regex: {len(facts)} topics")
-                    return facts
-            except Exception as e:
-                logger.error(f"Failed to extract JSON using regex: {e}")
-            
-            logger.error("Failed to fix JSON parsing issues")
-            return {}
+        return parse_facts_response(extraction_result)
     except Exception as e:
         logger.error(f"Error in fact extraction: {e}")
         logger.error(traceback.format_exc())
-        return {}
\ No newline at end of file
+        return {}
+
+
+async def extract_turn_facts(provider, user_message: Message, assistant_message: Message) -> Dict[str, List[str]]:
+    """
+    Use the LLM to extract key facts from a user/assistant turn with a single call.
+    """
+    logger.info(f"Extracting facts from turn: {user_message.content[:100]}...")
+    
+    context = build_turn_fact_extraction_context(user_message, assistant_message)
+    
+    try:
+        extraction_result = await provider.generate_response(context)
+        return parse_facts_response(extraction_result)
+    except Exception as e:
+        logger.error(f"Error in turn fact extraction: {e}")
+        logger.error(traceback.format_exc())
+        return {}
+
+
+def parse_facts_response(extraction_result: str) -> Dict[str, List[str]]:
+    """Parse the JSON object of facts out of a raw extraction response."""
+    logger.info(f"Raw extraction result length: {len(extraction_result)}")
+    
+    # Clean up the result
+    cleaned_result = extraction_result.strip()
+    
+    # Handle <think> tags if present
+    if "<think>" in cleaned_result and "</think>" in cleaned_result:
+        think_end = cleaned_result.rfind("</think>")
+        if think_end > 0:
+            cleaned_result = cleaned_result[think_end + 8:].strip()
+            logger.info(f"Removed <think> tags, remaining: {len(cleaned_result)} chars")
+    
+    # Handle markdown code blocks
+    if "```" in cleaned_result:
+        # Find the code block
+        start_block = cleaned_result.find("```")
+        end_block = cleaned_result.rfind("```")
+        
+        if start_block >= 0 and end_block > start_block:
+            # Extract content between code blocks
+            # Skip language specifier if present (```json)
+            content_start = cleaned_result.find("\n", start_block) + 1
+            if content_start > 0:
+                cleaned_result = cleaned_result[content_start:end_block].strip()
+                logger.info(f"Extracted from code block, content: {len(cleaned_result)} chars")
+    
+    logger.info(f"Cleaned extraction result: {cleaned_result[:100]}...")
+    
+    # Parse the JSON response
+    try:
+        facts = json.loads(cleaned_result)
+        logger.info(f"Successfully parsed facts: {len(facts)} topics")
+        return facts
+    except json.JSONDecodeError as e:
+        logger.error(f"Error parsing fact extraction result: {e}")
+        logger.error(f"Problem string: '{cleaned_result}'")
+        
+        # Try to fix common JSON issues
+        try:
+            # Try to find a valid JSON object in the string
+            import re
+            json_pattern = r'\{.*\}'
+            match = re.search(json_pattern, cleaned_result, re.DOTALL)
+            if match:
+                potential_json = match.group(0)
+                facts = json.loads(potential_json)
+                logger.info(f"Successfully extracted JSON using regex: {len(facts)} topics")
+                return facts
+        except Exception as e:
+            logger.error(f"Failed to extract JSON using regex: {e}")
+        
+        logger.error("Failed to fix JSON parsing issues")
+        return {}
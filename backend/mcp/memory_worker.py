@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import threading
+import traceback
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .context import Message
+
+logger = logging.getLogger(__name__)
+
+# handler(session_id, messages, summarize)
+MaintenanceHandler = Callable[[str, List[Message], bool], Awaitable[None]]
+
+
+class _PendingJob:
+    """Maintenance work waiting to run for one session."""
+
+    def __init__(self):
+        self.messages: List[Message] = []
+        self.summarize = False
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MemoryMaintenanceWorker:
+    """
+    Runs fact extraction and summarization for chat sessions off the chat critical path.
+
+    The worker has its own thread, event loop and queue. Work submitted for a
+    session is coalesced into one pending job and only starts once the
+    session has been quiet for `debounce_seconds`, so a burst of turns costs
+    one maintenance run. A newer summary request supersedes a pending one,
+    and when more than `max_pending_messages` messages pile up the oldest are
+    dropped as stale. Jobs for the same session never run concurrently.
+    """
+
+    def __init__(
+        self,
+        handler: MaintenanceHandler,
+        debounce_seconds: float = 3.0,
+        max_pending_messages: int = 8,
+        max_concurrent_jobs: int = 1
+    ):
+        """Initialize the worker. Call `start` before submitting work."""
+        self.handler = handler
+        self.debounce_seconds = debounce_seconds
+        self.max_pending_messages = max_pending_messages
+        self.max_concurrent_jobs = max_concurrent_jobs
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="memory-worker", daemon=True)
+        self._pending: Dict[str, _PendingJob] = {}  # Only touched on the worker loop
+        self._running: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._stats = {
+            "submitted": 0,
+            "coalesced": 0,
+            "dropped_stale_messages": 0,
+            "superseded_summaries": 0,
+            "completed": 0,
+            "failed": 0
+        }
+
+    def start(self) -> None:
+        """Start the worker thread."""
+        if self._thread.is_alive():
+            return
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._create_semaphore(), self.loop).result()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _create_semaphore(self) -> None:
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+
+    def submit(self, session_id: str, messages: List[Message], summarize: bool = False) -> None:
+        """Queue maintenance for a session. Safe to call from any thread."""
+        self.loop.call_soon_threadsafe(self._enqueue, session_id, list(messages), summarize)
+
+    def _enqueue(self, session_id: str, messages: List[Message], summarize: bool) -> None:
+        self._stats["submitted"] += 1
+        job = self._pending.get(session_id)
+        if job is None:
+            job = _PendingJob()
+            self._pending[session_id] = job
+        else:
+            self._stats["coalesced"] += 1
+            if job.summarize and summarize:
+                self._stats["superseded_summaries"] += 1
+
+        job.messages.extend(messages)
+        job.summarize = job.summarize or summarize
+
+        overflow = len(job.messages) - self.max_pending_messages
+        if overflow > 0:
+            del job.messages[:overflow]
+            self._stats["dropped_stale_messages"] += overflow
+
+        # Debounce: restart the quiet period on every submission
+        if job.timer is not None:
+            job.timer.cancel()
+        job.timer = self.loop.call_later(self.debounce_seconds, self._dispatch, session_id)
+
+    def _dispatch(self, session_id: str) -> None:
+        job = self._pending.get(session_id)
+        if job is None:
+            return
+        job.timer = None  # The quiet period is over
+        if session_id in self._running:
+            # Picked up when the running job for this session finishes
+            return
+        del self._pending[session_id]
+        self._running[session_id] = self.loop.create_task(self._run_job(session_id, job))
+
+    async def _run_job(self, session_id: str, job: _PendingJob) -> None:
+        try:
+            async with self._semaphore:
+                await self.handler(session_id, job.messages, job.summarize)
+            self._stats["completed"] += 1
+        except Exception as e:
+            self._stats["failed"] += 1
+            logger.error(f"Error in memory maintenance for session {session_id}: {e}")
+            logger.error(traceback.format_exc())
+        finally:
+            del self._running[session_id]
+            # Run work that arrived meanwhile if its quiet period has already passed
+            pending = self._pending.get(session_id)
+            if pending is not None and pending.timer is None:
+                self._dispatch(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get worker counters and current queue depth."""
+        async def collect():
+            return {
+                **self._stats,
+                "pending_sessions": len(self._pending),
+                "running_jobs": len(self._running)
+            }
+        return asyncio.run_coroutine_threadsafe(collect(), self.loop).result(timeout=5)
@@ -0,0 +1,218 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .context import Context, Message, MessageRole
+from .dedupe import NearDuplicateDetector
+from .tokens import MESSAGE_OVERHEAD_TOKENS, TokenCounter, count_message_tokens, get_token_counter
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ["question", "recent_turns", "chunks", "facts", "summary"]
+
+# "legacy": retrieved chunks go into the system prompt, memory follows the history.
+# "prefix_stable": system prompt, summary and history form a prefix that only grows
+# between turns, so the backend can reuse its prompt cache; facts and chunks,
+# which change with every query, come last, right before the question.
+LAYOUTS = ("legacy", "prefix_stable")
+
+
+class PromptChunk(BaseModel):
+    """A retrieved document chunk offered to the packer, best-ranked first."""
+    text: str
+    header: str = ""  # Source label rendered above the text
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+
+
+class PackedPrompt(BaseModel):
+    """Result of packing: the context to send and what was kept or dropped per category."""
+    context: Context
+    report: Dict[str, Any]
+
+
+def _suffix_prefix_overlap(first: str, second: str, min_overlap: int, max_overlap: int) -> int:
+    """Length of the longest suffix of `first` that is a prefix of `second` (0 if shorter than `min_overlap`)."""
+    if len(first) < min_overlap or len(second) < min_overlap:
+        return 0
+    probe = second[:min_overlap]
+    start = max(0, len(first) - max_overlap)
+    index = first.find(probe, start)
+    while index != -1:
+        if second.startswith(first[index:]):
+            return len(first) - index
+        index = first.find(probe, index + 1)
+    return 0
+
+
+class PromptPacker:
+    """
+    Fills a token budget with prompt material in priority order.
+
+    The question always goes in. Then, while budget remains: recent turns
+    (newest first, stopping at the first that does not fit, so the kept
+    history is contiguous), retrieved chunks in rank order, long-term facts,
+    and finally the conversation summary. Chunks that repeat or overlap
+    already packed chunks are trimmed or skipped before they are counted.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 4000,
+        counter: Optional[TokenCounter] = None,
+        near_duplicate_threshold: float = 0.8,
+        min_overlap_chars: int = 40,
+        max_overlap_chars: int = 400
+    ):
+        """Initialize the packer with a total prompt budget of `max_tokens`."""
+        self.max_tokens = max_tokens
+        self.counter = counter or get_token_counter()
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.min_overlap_chars = min_overlap_chars
+        self.max_overlap_chars = max_overlap_chars
+
+    def dedupe_chunks(self, chunks: List[PromptChunk]) -> List[PromptChunk]:
+        """
+        Drop duplicate chunks and trim text overlapping a higher-ranked chunk.
+
+        Splitters overlap neighbouring chunks, so when both neighbours are
+        retrieved the shared stretch would be sent twice.
+        """
+        detector = NearDuplicateDetector(threshold=self.near_duplicate_threshold)
+        kept: List[PromptChunk] = []
+        for chunk in chunks:
+            text = chunk.text.strip()
+            if not text or detector.check(text) or any(text in other.text for other in kept):
+                continue
+
+            for other in kept:
+                overlap = _suffix_prefix_overlap(other.text, text, self.min_overlap_chars, self.max_overlap_chars)
+                if overlap:
+                    text = text[overlap:].lstrip()
+                overlap = _suffix_prefix_overlap(text, other.text, self.min_overlap_chars, self.max_overlap_chars)
+                if overlap:
+                    text = text[:-overlap].rstrip()
+            if not text:
+                continue
+
+            detector.add(text)
+            kept.append(chunk.model_copy(update={"text": text}))
+        return kept
+
+    @staticmethod
+    def format_chunk(chunk: PromptChunk) -> str:
+        """Render a chunk for the system prompt."""
+        return f"{chunk.header}{chunk.text}\n\n"
+
+    def pack(
+        self,
+        question: str,
+        system_prompt: str = "",
+        documents_preamble: str = "",
+        recent_messages: Optional[List[Message]] = None,
+        chunks: Optional[List[PromptChunk]] = None,
+        facts: Optional[List[Message]] = None,
+        summary: Optional[Message] = None,
+        layout: str = "legacy"
+    ) -> PackedPrompt:
+        """
+        Pack a prompt for `question` within the budget, arranged by `layout` (see LAYOUTS).
+
+        Chunks follow `documents_preamble`, in the system prompt or in a
+        message of their own; the preamble is only counted and added when at
+        least one chunk fits.
+        """
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unsupported prompt layout: {layout}")
+        recent_messages = recent_messages or []
+        chunks = chunks or []
+        facts = facts or []
+
+        report = {category: {"kept": 0, "dropped": 0, "tokens": 0} for category in CATEGORIES}
+        used = self.counter.count(system_prompt) + MESSAGE_OVERHEAD_TOKENS if system_prompt else 0
+
+        def fits(tokens: int) -> bool:
+            return used + tokens <= self.max_tokens
+
+        def keep(category: str, tokens: int) -> None:
+            nonlocal used
+            used += tokens
+            report[category]["kept"] += 1
+            report[category]["tokens"] += tokens
+
+        # Question: always sent
+        question_message = Message(role=MessageRole.USER, content=question)
+        keep("question", count_message_tokens(question_message, self.counter))
+
+        # Recent turns, newest first, kept contiguous
+        kept_turns: List[Message] = []
+        for index, message in enumerate(reversed(recent_messages)):
+            tokens = count_message_tokens(message, self.counter)
+            if not fits(tokens):
+                report["recent_turns"]["dropped"] = len(recent_messages) - index
+                break
+            keep("recent_turns", tokens)
+            kept_turns.append(message)
+        kept_turns.reverse()
+
+        # Retrieved chunks in rank order
+        unique_chunks = self.dedupe_chunks(chunks)
+        report["chunks"]["duplicates"] = len(chunks) - len(unique_chunks)
+        documents_text = ""
+        preamble_tokens = self.counter.count(documents_preamble) if documents_preamble else 0
+        if layout == "prefix_stable":
+            preamble_tokens += MESSAGE_OVERHEAD_TOKENS
+        for chunk in unique_chunks:
+            rendered = self.format_chunk(chunk)
+            tokens = self.counter.count(rendered) + (preamble_tokens if not documents_text else 0)
+            if not fits(tokens):
+                report["chunks"]["dropped"] += 1
+                continue
+            keep("chunks", tokens)
+            documents_text += rendered
+
+        # Long-term facts
+        kept_facts: List[Message] = []
+        for message in facts:
+            tokens = count_message_tokens(message, self.counter)
+            if not fits(tokens):
+                report["facts"]["dropped"] += 1
+                continue
+            keep("facts", tokens)
+            kept_facts.append(message)
+
+        # Conversation summary
+        kept_summary = None
+        if summary is not None:
+            tokens = count_message_tokens(summary, self.counter)
+            if fits(tokens):
+                keep("summary", tokens)
+                kept_summary = summary
+            else:
+                report["summary"]["dropped"] += 1
+
+        full_system_prompt = system_prompt
+        if layout == "legacy":
+            if documents_text:
+                full_system_prompt = f"{system_prompt}\n\n{documents_preamble}{documents_text}" if system_prompt else f"{documents_preamble}{documents_text}"
+            messages = kept_turns + ([kept_summary] if kept_summary else []) + kept_facts + [question_message]
+        else:
+            messages = ([kept_summary] if kept_summary else []) + kept_turns + kept_facts
+            if documents_text:
+                messages.append(Message(
+                    role=MessageRole.SYSTEM,
+                    content=f"{documents_preamble}{documents_text}".rstrip(),
+                    metadata={"source": "retrieval"}
+                ))
+            messages.append(question_message)
+        context = Context(system_prompt=full_system_prompt or None, messages=messages)
+
+        report["layout"] = layout
+        report["budget"] = self.max_tokens
+        report["used"] = used
+        logger.info(
+            "Packed prompt: "
+            + ", ".join(f"{c} {report[c]['kept']} kept/{report[c]['dropped']} dropped" for c in CATEGORIES)
+            + f", {used}/{self.max_tokens} tokens"
+        )
+        return PackedPrompt(context=context, report=report)
@@ -1,62 +1,150 @@
+import asyncio
 import httpx
 import json
-from typing import Dict, Any, List, Optional
+import weakref
+from typing import Dict, Any, List, Optional, Callable, AsyncIterator, Union
 from abc import ABC, abstractmethod
+from pydantic import BaseModel, Field
 from .context import Context, MessageRole
 
 
+class StreamChunk(BaseModel):
+    """A piece of a streamed response. The final chunk has `done` set and carries usage stats."""
+    delta: str = ""
+    done: bool = False
+    complete: bool = False  # On the final chunk: the backend reported the response finished, not cut short
+    usage: Dict[str, Any] = Field(default_factory=dict)
+
+
 class LLMProvider(ABC):
     """Abstract base class for LLM providers following MCP."""
     
     @abstractmethod
-    async def generate_response(self, context: Context) -> str:
-        """Generate a response from the LLM using the provided context."""
+    def stream_response(self, context: Context) -> AsyncIterator[StreamChunk]:
+        """
+        Stream a response from the LLM as token deltas.
+        
+        Implementations are async generators. The last chunk has `done` set
+        and carries the backend's usage stats. Consumers may stop iterating
+        early; close the iterator (e.g. with `contextlib.aclosing`) to abort
+        the request right away.
+        """
         pass
+    
+    async def generate_response(self, context: Context, on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Generate a response from the LLM using the provided context.
+        
+        If `on_token` is given, it is called with each token delta as it arrives.
+        """
+        parts = []
+        async for chunk in self.stream_response(context):
+            if chunk.delta:
+                parts.append(chunk.delta)
+                if on_token:
+                    on_token(chunk.delta)
+        return "".join(parts)
 
 
 class OllamaProvider(LLMProvider):
     """Provider for Ollama API."""
     
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "gemma3:12b"):
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        model: str = "gemma3:12b",
+        max_connections: int = 8,
+        max_keepalive_connections: int = 4,
+        keepalive_expiry: float = 60.0,
+        echo_tokens: bool = False,
+        keep_alive: Optional[Union[str, int]] = None
+    ):
+        """
+        Initialize the provider.
+        
+        `keep_alive` is sent with every request and tells Ollama how long to keep
+        the model (and its prompt cache) loaded afterwards, e.g. "30m", 3600 or
+        -1 for indefinitely; None leaves Ollama's default (5 minutes).
+        """
         self.base_url = base_url
         self.model = model
         self.api_url = f"{base_url}/api/chat"
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.echo_tokens = echo_tokens  # Print tokens to stdout as they arrive (debugging only)
+        self.keep_alive = keep_alive
+        # One pooled client per event loop, since httpx clients cannot be shared across loops
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the keep-alive client for the running event loop, creating it if needed."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(limits=self.limits, timeout=240.0)
+            self._clients[loop] = client
+        return client
     
-    async def generate_response(self, context: Context) -> str:
-        """Generate a response from Ollama with streaming support."""
+    async def aclose(self) -> None:
+        """Close the client owned by the running event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+    
+    async def stream_response(self, context: Context) -> AsyncIterator[StreamChunk]:
+        """Stream a response from Ollama, ending with a chunk that carries usage stats."""
         payload = {
             "model": self.model,
             "messages": context.get_formatted_messages(),
-            "temperature": context.temperature,
+            "options": {"temperature": context.temperature},
             "stream": True
         }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
         
-        full_response = ""
-        
-        async with httpx.AsyncClient() as client:
-            async with client.stream("POST", self.api_url, json=payload, timeout=240.0) as response:
-                if response.status_code != 200:
-                    raise Exception(f"Ollama API error: {response.status_code}")
+        client = self._get_client()
+        async with client.stream("POST", self.api_url, json=payload) as response:
+            if response.status_code != 200:
+                raise Exception(f"Ollama API error: {response.status_code}")
+            
+            async for chunk in response.aiter_lines():
+                if not chunk:
+                    continue
+                
+                try:
+                    chunk_data = json.loads(chunk)
+                except json.JSONDecodeError:
+                    # Skip malformed JSON
+                    continue
+                
+                content = chunk_data.get("message", {}).get("content", "")
+                if self.echo_tokens:
+                    print(content, end="", flush=True)
                 
-                async for chunk in response.aiter_lines():
-                    if not chunk:
-                        continue
-                    
-                    try:
-                        chunk_data = json.loads(chunk)
-                        content = chunk_data.get("message", {}).get("content", "")
-                        print(content, end="", flush=True)
-                        full_response += content
-                    except json.JSONDecodeError:
-                        # Skip malformed JSON
-                        continue
-                    
-                    # Check if this is the final chunk
-                    if chunk_data.get("done", False):
-                        break
+                # Check if this is the final chunk
+                if chunk_data.get("done", False):
+                    if self.echo_tokens:
+                        print()  # Add a newline at the end
+                    yield StreamChunk(delta=content, done=True, complete=True, usage=self._usage_from_chunk(chunk_data))
+                    return
+                
+                if content:
+                    yield StreamChunk(delta=content)
         
-        print()  # Add a newline at the end
-        return full_response
+        # The stream ended without a final chunk, e.g. the connection dropped
+        yield StreamChunk(done=True, complete=False)
+    
+    @staticmethod
+    def _usage_from_chunk(chunk_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract token counts and timings (in nanoseconds) from Ollama's final chunk."""
+        fields = [
+            "prompt_eval_count", "eval_count", "total_duration",
+            "load_duration", "prompt_eval_duration", "eval_duration", "done_reason"
+        ]
+        return {field: chunk_data[field] for field in fields if field in chunk_data}
 
 
 class ProviderFactory:
@@ -0,0 +1,167 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from .context import Context
+from .providers import LLMProvider, StreamChunk
+
+
+class Priority(IntEnum):
+    """Priority classes for LLM requests. Lower values are served first."""
+    INTERACTIVE = 0  # Answers a user is waiting for
+    QUERY_REWRITE = 1  # Retrieval helpers on the path to an answer
+    BACKGROUND = 2  # Memory maintenance: fact extraction, summaries
+
+
+class _BackendState:
+    """Slot accounting for a single backend."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        # (priority, sequence, future, loop) - the sequence keeps FIFO order within a priority
+        self.waiters: List[Tuple[int, int, asyncio.Future, asyncio.AbstractEventLoop]] = []
+
+
+class LLMScheduler:
+    """
+    Priority scheduler in front of one or more LLM backends.
+
+    Each backend serves at most `max_concurrency_per_backend` requests at a
+    time. Requests beyond that wait in a priority queue, so a queued
+    background job is deferred whenever an interactive request or query
+    rewrite arrives. Running generations are never interrupted.
+
+    The scheduler is thread-safe and can be used from several event loops.
+    """
+
+    def __init__(self, max_concurrency_per_backend: int = 2, backend_limits: Optional[Dict[str, int]] = None):
+        """Initialize the scheduler. `backend_limits` overrides the limit for specific backends."""
+        self.max_concurrency_per_backend = max_concurrency_per_backend
+        self.backend_limits = backend_limits or {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._backends: Dict[str, _BackendState] = {}
+        self._wait_stats: Dict[Priority, Dict[str, float]] = {
+            priority: {"requests": 0, "total_wait": 0.0, "max_wait": 0.0} for priority in Priority
+        }
+
+    def _state(self, backend: str) -> _BackendState:
+        state = self._backends.get(backend)
+        if state is None:
+            limit = self.backend_limits.get(backend, self.max_concurrency_per_backend)
+            state = _BackendState(limit)
+            self._backends[backend] = state
+        return state
+
+    @asynccontextmanager
+    async def slot(self, backend: str, priority: Priority) -> AsyncIterator[None]:
+        """Wait for a free slot on `backend` and hold it for the duration of the block."""
+        loop = asyncio.get_running_loop()
+        enqueued_at = time.perf_counter()
+        future = None
+
+        with self._lock:
+            state = self._state(backend)
+            if state.active < state.limit and not state.waiters:
+                state.active += 1
+            else:
+                future = loop.create_future()
+                heapq.heappush(state.waiters, (int(priority), next(self._sequence), future, loop))
+
+        if future is not None:
+            try:
+                await future
+            except asyncio.CancelledError:
+                # If the slot was already handed to us, pass it on
+                if future.done() and not future.cancelled():
+                    self._release(backend)
+                raise
+
+        self._record_wait(priority, time.perf_counter() - enqueued_at)
+        try:
+            yield
+        finally:
+            self._release(backend)
+
+    def _release(self, backend: str) -> None:
+        """Hand the slot to the highest-priority waiter, or free it."""
+        with self._lock:
+            state = self._state(backend)
+            while state.waiters:
+                _, _, future, loop = heapq.heappop(state.waiters)
+                if future.cancelled():
+                    continue
+                loop.call_soon_threadsafe(self._grant, backend, future)
+                return
+            state.active -= 1
+
+    def _grant(self, backend: str, future: asyncio.Future) -> None:
+        if future.cancelled():
+            self._release(backend)
+        else:
+            future.set_result(None)
+
+    def _record_wait(self, priority: Priority, wait: float) -> None:
+        with self._lock:
+            stats = self._wait_stats[priority]
+            stats["requests"] += 1
+            stats["total_wait"] += wait
+            stats["max_wait"] = max(stats["max_wait"], wait)
+
+    def wrap(self, provider: LLMProvider, priority: Priority) -> "ScheduledProvider":
+        """Get a view of `provider` whose requests go through this scheduler at `priority`."""
+        if isinstance(provider, ScheduledProvider):
+            provider = provider.provider
+        return ScheduledProvider(provider, self, priority)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue wait-time metrics per priority and current load per backend."""
+        with self._lock:
+            priorities = {}
+            for priority, stats in self._wait_stats.items():
+                requests = stats["requests"]
+                priorities[priority.name.lower()] = {
+                    "requests": int(requests),
+                    "avg_wait_ms": round(stats["total_wait"] / requests * 1000, 2) if requests else 0.0,
+                    "max_wait_ms": round(stats["max_wait"] * 1000, 2)
+                }
+            backends = {
+                backend: {
+                    "active": state.active,
+                    "limit": state.limit,
+                    "queued": sum(1 for waiter in state.waiters if not waiter[2].cancelled())
+                }
+                for backend, state in self._backends.items()
+            }
+        return {"priorities": priorities, "backends": backends}
+
+
+class ScheduledProvider(LLMProvider):
+    """Provider wrapper that acquires a scheduler slot before each request."""
+
+    def __init__(self, provider: LLMProvider, scheduler: LLMScheduler, priority: Priority):
+        self.provider = provider
+        self.scheduler = scheduler
+        self.priority = priority
+        self.backend = getattr(provider, "base_url", type(provider).__name__)
+
+    async def stream_response(self, context: Context) -> AsyncIterator[StreamChunk]:
+        """Stream a response, holding a scheduler slot until the stream ends or is closed."""
+        async with self.scheduler.slot(self.backend, self.priority):
+            async for chunk in self.provider.stream_response(context):
+                yield chunk
+
+    async def generate_response(self, context: Context, on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Generate a response once the scheduler grants a slot."""
+        async with self.scheduler.slot(self.backend, self.priority):
+            return await self.provider.generate_response(context, on_token=on_token)
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose the wrapped provider's attributes (model, base_url, ...)
+        return getattr(self.provider, name)
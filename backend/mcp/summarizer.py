@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import LLMResponseCache
+from .context import Context, MessageRole
+from .providers import LLMProvider
+from .tokens import TokenCounter, get_token_counter
+from .utils import truncate_text_to_tokens
+
+logger = logging.getLogger(__name__)
+
+MAP_PROMPT = "Summarize this document section concisely."
+SINGLE_PROMPT = "Create a comprehensive summary of this document."
+REDUCE_PROMPT = (
+    "Combine these summaries of consecutive document sections into one concise summary. "
+    "Keep the key points, figures and names; drop repetition."
+)
+
+
+def document_hash(chunks: List[str]) -> str:
+    """Content hash of a document given as its chunks in order."""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class TreeSummarizer:
+    """
+    Map-reduce summarizer for documents too long for one prompt.
+
+    The map step groups consecutive chunks, never splitting one, into groups
+    of at most `group_tokens` and summarizes the groups concurrently, at most
+    `max_concurrency` at a time. The reduce step groups consecutive summaries
+    the same way and summarizes them again, level by level, until the joined
+    summaries fit `max_tokens`. Every summary is cached under a hash of the
+    model, prompt and input text, so a later run over the same document skips
+    the LLM calls whose input has not changed.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 1500,
+        group_tokens: int = 2500,
+        max_concurrency: int = 2,
+        cache: Optional[LLMResponseCache] = None,
+        counter: Optional[TokenCounter] = None,
+        max_levels: int = 6
+    ):
+        """Initialize the summarizer."""
+        self.max_tokens = max_tokens
+        self.group_tokens = group_tokens
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.counter = counter or get_token_counter()
+        self.max_levels = max_levels
+
+    def group(self, texts: List[str], min_size: int = 1) -> List[List[str]]:
+        """Group consecutive texts into groups of at most `group_tokens`, with at least `min_size` texts each where possible."""
+        groups: List[List[str]] = []
+        current: List[str] = []
+        current_tokens = 0
+        for text in texts:
+            text = truncate_text_to_tokens(text, self.group_tokens // min_size, self.counter)
+            tokens = self.counter.count(text)
+            if current and current_tokens + tokens > self.group_tokens and len(current) >= min_size:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            # A short tail would not shrink the next level; borrow from the previous group or join it
+            while len(current) < min_size and groups and len(groups[-1]) > min_size:
+                current.insert(0, groups[-1].pop())
+            if len(current) < min_size and groups:
+                groups[-1].extend(current)
+            else:
+                groups.append(current)
+        return groups
+
+    async def summarize(self, provider: LLMProvider, chunks: List[str], title: str = "") -> Tuple[str, Dict[str, Any]]:
+        """
+        Summarize a document given as its chunks in order.
+
+        Returns the summary and a report with the number of levels, groups, LLM calls and cache hits.
+        """
+        stats = {"levels": 0, "map_groups": 0, "llm_calls": 0, "cache_hits": 0}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        groups = self.group(chunks)
+        stats["map_groups"] = len(groups)
+        if len(groups) == 1:
+            summary = await self._summarize_text(
+                provider, SINGLE_PROMPT, f"Document: {title}\n\n" + "".join(groups[0]), semaphore, stats
+            )
+            stats["levels"] = 1
+            return summary, stats
+
+        summaries = await asyncio.gather(*[
+            self._summarize_text(
+                provider, MAP_PROMPT, f"Document section {i + 1}/{len(groups)}:\n\n" + "".join(group), semaphore, stats
+            )
+            for i, group in enumerate(groups)
+        ])
+        stats["levels"] = 1
+
+        while len(summaries) > 1 and self._joined_tokens(summaries) > self.max_tokens and stats["levels"] < self.max_levels:
+            groups = self.group(summaries, min_size=2)
+            summaries = await asyncio.gather(*[
+                self._summarize_text(
+                    provider, REDUCE_PROMPT, "\n\n".join(f"Section summary:\n{text}" for text in group), semaphore, stats
+                )
+                for group in groups
+            ])
+            stats["levels"] += 1
+
+        summary = truncate_text_to_tokens("\n\n".join(summaries), self.max_tokens, self.counter)
+        logger.info(f"Summarized {title or 'document'} in {stats['levels']} levels from {stats['map_groups']} groups")
+        return summary, stats
+
+    def _joined_tokens(self, summaries: List[str]) -> int:
+        return self.counter.count("\n\n".join(summaries))
+
+    def cache_key(self, provider: LLMProvider, prompt: str, text: str) -> str:
+        """Content hash identifying a summary of `text` by this model and prompt."""
+        model = getattr(provider, "model", "")
+        digest = hashlib.sha256(f"{model}\0{prompt}\0{text}".encode("utf-8")).hexdigest()
+        return f"tree-summary:{digest}"
+
+    async def _summarize_text(
+        self, provider: LLMProvider, prompt: str, text: str, semaphore: asyncio.Semaphore, stats: Dict[str, int]
+    ) -> str:
+        key = self.cache_key(provider, prompt, text)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                stats["cache_hits"] += 1
+                return cached
+
+        context = Context(system_prompt=prompt)
+        context.add_message(MessageRole.USER, text)
+        parts = []
+        complete = False
+        async with semaphore:
+            async for chunk in provider.stream_response(context):
+                parts.append(chunk.delta)
+                if chunk.done:
+                    complete = chunk.complete
+        stats["llm_calls"] += 1
+        summary = "".join(parts)
+
+        # A summary cut short by the backend is used once but never cached
+        if self.cache is not None and complete and summary:
+            self.cache.put(key, summary)
+        return summary
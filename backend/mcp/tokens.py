@@ -0,0 +1,176 @@
+import logging
+import math
+import os
+import re
+from typing import Optional
+
+from .context import Message
+
+logger = logging.getLogger(__name__)
+
+# Try to import tiktoken
+try:
+    import tiktoken
+    HAS_TIKTOKEN = True
+except ImportError:
+    HAS_TIKTOKEN = False
+
+# Try to import Hugging Face tokenizers
+try:
+    from tokenizers import Tokenizer
+    HAS_TOKENIZERS = True
+except ImportError:
+    HAS_TOKENIZERS = False
+
+# Tokens a chat template adds around each message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+
+class TokenCounter:
+    """Base class for token counters."""
+
+    name = "base"
+
+    def count(self, text: str) -> int:
+        """Count the tokens in a text."""
+        raise NotImplementedError("Subclasses must implement this method")
+
+
+class EstimatedTokenCounter(TokenCounter):
+    """
+    Tokenizer-free estimate calibrated against common BPE tokenizers.
+
+    English prose averages about 4 characters and 0.75 words per token;
+    code, numbers and punctuation-heavy text tokenize denser than that, which
+    the word/punctuation term catches. The larger of the two estimates wins.
+    """
+
+    name = "estimate"
+
+    def __init__(self, chars_per_token: float = 4.0, tokens_per_word: float = 1.33):
+        """Initialize the estimator."""
+        self.chars_per_token = chars_per_token
+        self.tokens_per_word = tokens_per_word
+
+    def count(self, text: str) -> int:
+        """Estimate the tokens in a text."""
+        if not text:
+            return 0
+        by_chars = len(text) / self.chars_per_token
+        by_words = len(_WORD.findall(text)) * self.tokens_per_word
+        return math.ceil(max(by_chars, by_words))
+
+
+class TiktokenCounter(TokenCounter):
+    """Token counter using a tiktoken encoding."""
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        """Initialize the counter."""
+        if not HAS_TIKTOKEN:
+            raise ImportError(
+                "tiktoken is required for this token counter. "
+                "Install it with 'pip install tiktoken'"
+            )
+        self.encoding = tiktoken.get_encoding(encoding_name)
+        self.name = f"tiktoken:{encoding_name}"
+
+    def count(self, text: str) -> int:
+        """Count the tokens in a text."""
+        return len(self.encoding.encode(text, disallowed_special=())) if text else 0
+
+
+class HuggingFaceTokenCounter(TokenCounter):
+    """Token counter using a Hugging Face tokenizer (a hub name or a tokenizer.json path)."""
+
+    def __init__(self, tokenizer_name: str):
+        """Initialize the counter."""
+        if not HAS_TOKENIZERS:
+            raise ImportError(
+                "tokenizers is required for this token counter. "
+                "Install it with 'pip install tokenizers'"
+            )
+        if os.path.exists(tokenizer_name):
+            self.tokenizer = Tokenizer.from_file(tokenizer_name)
+        else:
+            self.tokenizer = Tokenizer.from_pretrained(tokenizer_name)
+        self.name = f"hf:{tokenizer_name}"
+
+    def count(self, text: str) -> int:
+        """Count the tokens in a text."""
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids) if text else 0
+
+
+def create_token_counter(counter_type: str = "auto", **kwargs) -> TokenCounter:
+    """
+    Create a token counter of the specified type.
+
+    "auto" uses tiktoken when it is installed and the calibrated estimate otherwise.
+    """
+    if counter_type == "auto":
+        try:
+            return TiktokenCounter(**kwargs)
+        except Exception as e:
+            logger.info(f"tiktoken not available ({e}), estimating token counts")
+            return EstimatedTokenCounter()
+    elif counter_type == "tiktoken":
+        return TiktokenCounter(**kwargs)
+    elif counter_type == "huggingface":
+        return HuggingFaceTokenCounter(**kwargs)
+    elif counter_type == "estimate":
+        return EstimatedTokenCounter(**kwargs)
+    else:
+        raise ValueError(f"Unsupported token counter type: {counter_type}")
+
+
+_default_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    """Get the process-wide token counter, creating it from MCP_TOKEN_COUNTER on first use."""
+    global _default_counter
+    if _default_counter is None:
+        counter_type = os.environ.get("MCP_TOKEN_COUNTER", "auto")
+        tokenizer_name = os.environ.get("MCP_TOKENIZER")
+        try:
+            if counter_type == "huggingface" and tokenizer_name:
+                _default_counter = create_token_counter(counter_type, tokenizer_name=tokenizer_name)
+            else:
+                _default_counter = create_token_counter(counter_type)
+        except Exception as e:
+            logger.error(f"Error creating {counter_type} token counter, estimating token counts: {e}")
+            _default_counter = EstimatedTokenCounter()
+    return _default_counter
+
+
+def set_token_counter(counter: TokenCounter) -> None:
+    """Replace the process-wide token counter."""
+    global _default_counter
+    _default_counter = counter
+
+
+def count_message_tokens(message: Message, counter: Optional[TokenCounter] = None) -> int:
+    """
+    Count the tokens of a message, including per-message template overhead.
+
+    The count is cached on `message.metadata` together with the counter name
+    and the content's length and hash, so a message is tokenized once per
+    counter and an edited message is counted again. Python caches a string's
+    hash, so checking it is cheap.
+    """
+    counter = counter or get_token_counter()
+    content_key = [len(message.content), hash(message.content)]
+    cached = message.metadata.get("token_count")
+    if (
+        cached is not None
+        and message.metadata.get("token_counter") == counter.name
+        and message.metadata.get("token_count_key") == content_key
+    ):
+        return cached
+
+    tokens = counter.count(message.content) + MESSAGE_OVERHEAD_TOKENS
+    message.metadata["token_count"] = tokens
+    message.metadata["token_counter"] = counter.name
+    message.metadata["token_count_key"] = content_key
+    return tokens
@@ -0,0 +1,100 @@
+import threading
+from collections import deque
+from typing import Dict, List
+
+
+class TopicMatcher:
+    """
+    Aho-Corasick automaton over long-term memory topics.
+
+    Finds every topic that occurs (case-insensitively) as a substring of a
+    query in a single pass over the query, so the cost depends on the query
+    length rather than on the number of topics. Topics are inserted into the
+    trie as they are added; failure links are recomputed lazily, only when
+    new topics arrived since the last search. Adds and searches are
+    serialized by a lock, since a search may rebuild the links.
+    """
+
+    def __init__(self):
+        """Initialize an empty automaton."""
+        self._goto: List[Dict[str, int]] = [{}]  # Trie transitions per node
+        self._fail: List[int] = [0]  # Failure link per node
+        self._output_link: List[int] = [-1]  # Nearest node on the failure chain that ends a topic
+        self._topics: List[List[str]] = [[]]  # Topics ending exactly at each node
+        self._size = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, topic: str) -> None:
+        """Add a topic to the automaton."""
+        key = topic.lower()
+        if not key:
+            return
+
+        with self._lock:
+            node = 0
+            for char in key:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    # Create the node before linking to it, so no transition points past the end
+                    next_node = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output_link.append(-1)
+                    self._topics.append([])
+                    self._goto[node][char] = next_node
+                node = next_node
+
+            if topic not in self._topics[node]:
+                self._topics[node].append(topic)
+                self._size += 1
+                self._dirty = True
+
+    def _build_links(self) -> None:
+        """Recompute failure and output links breadth-first."""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._output_link[child] = -1
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+
+                fail_node = self._fail[child]
+                self._output_link[child] = fail_node if self._topics[fail_node] else self._output_link[fail_node]
+                queue.append(child)
+
+        self._dirty = False
+
+    def find(self, text: str) -> List[str]:
+        """Get the topics that occur in `text`, in order of where they first end."""
+        with self._lock:
+            if self._size == 0:
+                return []
+            if self._dirty:
+                self._build_links()
+
+            found: Dict[str, None] = {}
+            node = 0
+            for char in text.lower():
+                while node and char not in self._goto[node]:
+                    node = self._fail[node]
+                node = self._goto[node].get(char, 0)
+
+                match = node if self._topics[node] else self._output_link[node]
+                while match > 0:
+                    for topic in self._topics[match]:
+                        found.setdefault(topic, None)
+                    match = self._output_link[match]
+
+            return list(found)
@@ -1,34 +1,73 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import logging
 from .context import Context, Message, MessageRole
+from .tokens import TokenCounter, MESSAGE_OVERHEAD_TOKENS, count_message_tokens, get_token_counter
+
+logger = logging.getLogger(__name__)
 
 
 def estimate_token_count(text: str) -> int:
-    """Estimate token count in text (rough approximation)."""
-    # A very rough estimation - about 4 chars per token on average
-    return len(text) // 4
-
-
-def truncate_context_if_needed(context: Context, max_tokens: int = 4000) -> Context:
-    """Truncate context to fit within token limit."""
-    # Make a copy of the context
-    new_context = Context(
-        system_prompt=context.system_prompt,
-        temperature=context.temperature,
-        max_tokens=context.max_tokens,
-        metadata=context.metadata.copy()
-    )
-    
-    # Start with system prompt tokens
-    total_tokens = estimate_token_count(context.system_prompt or "")
-    
-    # Add messages from newest to oldest until we hit token limit
-    for message in reversed(context.messages):
-        msg_tokens = estimate_token_count(message.content)
-        if total_tokens + msg_tokens <= max_tokens:
-            new_context.messages.insert(0, message)
-            total_tokens += msg_tokens
-        else:
-            # If we can't add more messages, break
+    """Count tokens in text with the configured token counter."""
+    return get_token_counter().count(text)
+
+
+def truncate_text_to_tokens(text: str, max_tokens: int, counter: Optional[TokenCounter] = None) -> str:
+    """Cut text down to at most `max_tokens` tokens, keeping its beginning."""
+    counter = counter or get_token_counter()
+    if max_tokens <= 0:
+        return ""
+    tokens = counter.count(text)
+    if tokens <= max_tokens:
+        return text
+
+    # Scale by the observed characters per token, then shrink until it fits
+    end = int(len(text) * max_tokens / tokens)
+    while end > 0 and counter.count(text[:end]) > max_tokens:
+        end = int(end * 0.9)
+    return text[:end]
+
+
+def truncate_context_if_needed(
+    context: Context,
+    max_tokens: int = 4000,
+    counter: Optional[TokenCounter] = None
+) -> Context:
+    """
+    Truncate context to fit within token limit.
+
+    The system prompt, including any retrieved documents embedded in it, is
+    counted first. Messages are kept newest first; the newest message is
+    always kept, and if it plus the system prompt still do not fit, the end
+    of the system prompt (where retrieved documents go) is cut. Message
+    counts are cached on the messages, so this is linear in the number of
+    messages. The context is returned unchanged when it already fits.
+    """
+    counter = counter or get_token_counter()
+    system_prompt = context.system_prompt or ""
+    system_tokens = counter.count(system_prompt) + MESSAGE_OVERHEAD_TOKENS if system_prompt else 0
+    message_tokens = [count_message_tokens(message, counter) for message in context.messages]
+
+    if system_tokens + sum(message_tokens) <= max_tokens:
+        return context
+
+    # Keep messages from newest to oldest until we hit token limit
+    kept: List[Message] = []
+    total_tokens = system_tokens
+    for message, tokens in zip(reversed(context.messages), reversed(message_tokens)):
+        if kept and total_tokens + tokens > max_tokens:
             break
-    
-    return new_context
\ No newline at end of file
+        kept.append(message)
+        total_tokens += tokens
+    kept.reverse()
+
+    if system_prompt and total_tokens > max_tokens:
+        # The system prompt and documents crowd out even the newest message
+        budget = max_tokens - (total_tokens - system_tokens) - MESSAGE_OVERHEAD_TOKENS
+        system_prompt = truncate_text_to_tokens(system_prompt, budget, counter)
+        logger.info(f"Truncated system prompt from {system_tokens} tokens to fit {max_tokens}-token context")
+
+    return context.model_copy(update={
+        "messages": kept,
+        "system_prompt": system_prompt or None,
+        "metadata": context.metadata.copy()
+    })
@@ -20,10 +20,36 @@ class VectorDatabase:
         """Add embeddings to the database."""
         raise NotImplementedError("Subclasses must implement this method")
     
-    def search(self, query: str, embedding_generator: EmbeddingGenerator, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search the database for similar documents."""
+    def search(
+        self,
+        query: str,
+        embedding_generator: EmbeddingGenerator,
+        top_k: int = 5,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search the database for similar documents.
+        
+        With `mmr_lambda` set, results are picked by maximal marginal relevance
+        from the `fetch_k` most similar documents (see `maximal_marginal_relevance`).
+        """
         raise NotImplementedError("Subclasses must implement this method")
     
+    def search_many(
+        self,
+        queries: List[str],
+        embedding_generator: EmbeddingGenerator,
+        top_k: int = 5,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search the database for several queries, returning one result list per query."""
+        return [
+            self.search(query, embedding_generator, top_k=top_k, mmr_lambda=mmr_lambda, fetch_k=fetch_k)
+            for query in queries
+        ]
+    
     def clear(self) -> None:
         """Clear the database."""
         raise NotImplementedError("Subclasses must implement this method")
@@ -91,29 +117,73 @@ class ChromaVectorDB(VectorDatabase):
             traceback.print_exc()
             raise
     
-    def search(self, query: str, embedding_generator: EmbeddingGenerator, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search the database for similar documents."""
-        # Generate query embedding
-        query_embeddings = embedding_generator.generate([query])
-        if not query_embeddings:
+    def search(
+        self,
+        query: str,
+        embedding_generator: EmbeddingGenerator,
+        top_k: int = 5,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Search the database for similar documents, optionally diversified by maximal marginal relevance."""
+        return self.search_many([query], embedding_generator, top_k=top_k, mmr_lambda=mmr_lambda, fetch_k=fetch_k)[0]
+    
+    def search_many(
+        self,
+        queries: List[str],
+        embedding_generator: EmbeddingGenerator,
+        top_k: int = 5,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search the database for several queries with one batched embedding call and one query.
+        
+        With `mmr_lambda` set, the `fetch_k` nearest documents (default 4 * top_k)
+        are fetched with their embeddings and re-picked by maximal marginal relevance.
+        """
+        if not queries:
             return []
         
-        query_vector = query_embeddings[0].vector
+        # Generate all query embeddings in one batch
+        query_embeddings = embedding_generator.generate(queries)
+        if not query_embeddings:
+            return [[] for _ in queries]
+        query_vectors = [embedding.vector for embedding in query_embeddings]
+        
+        if mmr_lambda is None:
+            results = self.collection.query(query_embeddings=query_vectors, n_results=top_k)
+            return [self._format_results(results, q) for q in range(len(queries))]
         
-        # Search collection
         results = self.collection.query(
-            query_embeddings=query_vector,
-            n_results=top_k
+            query_embeddings=query_vectors,
+            n_results=max(fetch_k or 4 * top_k, top_k),
+            include=["documents", "metadatas", "distances", "embeddings"]
         )
         
-        # Format results
+        all_results = []
+        for q, query_vector in enumerate(query_vectors):
+            candidates = self._format_results(results, q)
+            if not candidates:
+                all_results.append([])
+                continue
+            candidate_matrix = _normalize_rows(results["embeddings"][q])
+            query_similarities = candidate_matrix @ _normalize_rows([query_vector])[0]
+            picked = maximal_marginal_relevance(query_similarities, candidate_matrix, mmr_lambda, top_k)
+            all_results.append([candidates[i] for i in picked])
+        
+        return all_results
+    
+    @staticmethod
+    def _format_results(results: Dict[str, Any], q: int) -> List[Dict[str, Any]]:
+        """Format the results of the `q`-th query of a ChromaDB query response."""
         formatted_results = []
-        for i in range(len(results["ids"][0])):
+        for i in range(len(results["ids"][q])):
             result = {
-                "id": results["ids"][0][i],
-                "text": results["documents"][0][i],
-                "metadata": results["metadatas"][0][i] if results["metadatas"] else {},
-                "distance": results["distances"][0][i] if "distances" in results else None
+                "id": results["ids"][q][i],
+                "text": results["documents"][q][i],
+                "metadata": results["metadatas"][q][i] if results["metadatas"] else {},
+                "distance": results["distances"][q][i] if "distances" in results else None
             }
             formatted_results.append(result)
         
@@ -131,56 +201,140 @@ class InMemoryVectorDB(VectorDatabase):
     def __init__(self):
         """Initialize an empty in-memory vector database."""
         self.embeddings = []
+        self._matrix = None  # Normalized embedding matrix, rebuilt after changes
     
     def add_embeddings(self, embeddings: List[Embedding]) -> None:
         """Add embeddings to the database."""
         self.embeddings.extend(embeddings)
+        self._matrix = None
     
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Calculate cosine similarity between two vectors."""
-        import numpy as np
-        v1 = np.array(vec1)
-        v2 = np.array(vec2)
-        return np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
+    def _normalized_matrix(self):
+        """Get the L2-normalized embeddings as one matrix, one row per embedding."""
+        if self._matrix is None or len(self._matrix) != len(self.embeddings):
+            self._matrix = _normalize_rows([embedding.vector for embedding in self.embeddings])
+        return self._matrix
     
-    def search(self, query: str, embedding_generator: EmbeddingGenerator, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search the database for similar documents."""
-        if not self.embeddings:
-            return []
+    def search_many(
+        self,
+        queries: List[str],
+        embedding_generator: EmbeddingGenerator,
+        top_k: int = 5,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search the database for several queries with one batched embedding call and one matrix product.
         
-        # Generate query embedding
-        query_embeddings = embedding_generator.generate([query])
-        if not query_embeddings:
-            return []
+        With `mmr_lambda` set, each query's results are picked by maximal marginal
+        relevance from its `fetch_k` most similar embeddings (default 4 * top_k):
+        1.0 ranks by similarity alone, lower values favour results unlike those
+        already picked, which skips near-duplicate chunks.
+        """
+        import numpy as np
+        if not self.embeddings or not queries:
+            return [[] for _ in queries]
         
-        query_vector = query_embeddings[0].vector
+        # Generate all query embeddings in one batch
+        query_embeddings = embedding_generator.generate(queries)
+        if not query_embeddings:
+            return [[] for _ in queries]
         
-        # Calculate similarities
-        similarities = []
-        for i, embedding in enumerate(self.embeddings):
-            similarity = self._cosine_similarity(query_vector, embedding.vector)
-            similarities.append((i, similarity))
+        query_matrix = _normalize_rows([embedding.vector for embedding in query_embeddings])
         
-        # Sort by similarity (descending)
-        similarities.sort(key=lambda x: x[1], reverse=True)
+        # Cosine similarity of every query against every embedding: (queries x embeddings)
+        matrix = self._normalized_matrix()
+        similarities = query_matrix @ matrix.T
         
-        # Format top_k results
-        results = []
-        for i, similarity in similarities[:top_k]:
-            embedding = self.embeddings[i]
-            result = {
-                "id": str(i),
-                "text": embedding.text,
-                "metadata": embedding.metadata,
-                "distance": 1.0 - similarity  # Convert similarity to distance
-            }
-            results.append(result)
+        k = min(top_k, similarities.shape[1])
+        if mmr_lambda is not None:
+            fetch_k = min(max(fetch_k or 4 * top_k, k), similarities.shape[1])
+        all_results = []
+        for row in similarities:
+            if mmr_lambda is None:
+                top = np.argpartition(-row, k - 1)[:k]
+                top = top[np.argsort(-row[top])]
+            else:
+                candidates = np.argpartition(-row, fetch_k - 1)[:fetch_k]
+                candidates = candidates[np.argsort(-row[candidates])]
+                top = candidates[maximal_marginal_relevance(row[candidates], matrix[candidates], mmr_lambda, k)]
+            all_results.append([
+                {
+                    "id": str(i),
+                    "text": self.embeddings[i].text,
+                    "metadata": self.embeddings[i].metadata,
+                    "distance": 1.0 - float(row[i])  # Convert similarity to distance
+                }
+                for i in top
+            ])
         
-        return results
+        return all_results
+    
+    def search(
+        self,
+        query: str,
+        embedding_generator: EmbeddingGenerator,
+        top_k: int = 5,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Search the database for similar documents, optionally diversified by maximal marginal relevance."""
+        return self.search_many([query], embedding_generator, top_k=top_k, mmr_lambda=mmr_lambda, fetch_k=fetch_k)[0]
     
     def clear(self) -> None:
         """Clear the database."""
         self.embeddings = []
+        self._matrix = None
+
+
+def _normalize_rows(vectors):
+    """L2-normalize vectors into a float32 matrix, one row per vector."""
+    import numpy as np
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def maximal_marginal_relevance(query_similarities, candidate_matrix, mmr_lambda: float, top_k: int) -> List[int]:
+    """
+    Pick `top_k` candidates by maximal marginal relevance.
+    
+    Each step takes the candidate maximizing
+    mmr_lambda * similarity to the query - (1 - mmr_lambda) * max similarity to the picked ones.
+    The candidate similarity matrix is computed once and the running maximum is
+    updated with one vector operation per pick.
+    
+    Args:
+        query_similarities: Similarity of each candidate to the query
+        candidate_matrix: L2-normalized candidate embeddings, one row per candidate
+        mmr_lambda: Relevance weight in [0, 1]
+        top_k: Number of candidates to pick
+    
+    Returns:
+        Indices into the candidates, in pick order
+    """
+    import numpy as np
+    n = len(query_similarities)
+    top_k = min(top_k, n)
+    if top_k == 0:
+        return []
+    
+    pairwise = candidate_matrix @ candidate_matrix.T
+    max_similarity = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    picked = []
+    for _ in range(top_k):
+        if picked:
+            scores = mmr_lambda * query_similarities - (1 - mmr_lambda) * max_similarity
+        else:
+            scores = query_similarities.astype(np.float32, copy=True)
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, pairwise[best])
+    
+    return picked
 
 
 def get_vector_database(db_type: str = "chroma", **kwargs) -> VectorDatabase:
@@ -0,0 +1,42 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[Any]],
+    key: Callable[[Any], Hashable],
+    k: int = 60,
+    top_k: Optional[int] = None,
+    weights: Optional[List[float]] = None
+) -> List[Any]:
+    """
+    Merge ranked result lists with reciprocal-rank fusion.
+
+    Each item scores sum(weight / (k + rank)) over the lists it appears in,
+    with ranks starting at 1. Items are identified by `key`; the first
+    occurrence is the one returned. Ties keep the order of first appearance.
+
+    Args:
+        result_lists: Ranked lists, best first
+        key: Identity of an item across lists
+        k: Damping constant; larger values flatten the rank differences
+        top_k: Number of fused items to return (all if None)
+        weights: Per-list weights (1.0 each if None)
+
+    Returns:
+        The fused list, best first
+    """
+    scores: Dict[Hashable, float] = {}
+    items: Dict[Hashable, Any] = {}
+    for list_index, results in enumerate(result_lists):
+        weight = weights[list_index] if weights else 1.0
+        for rank, item in enumerate(results, start=1):
+            item_key = key(item)
+            if item_key not in items:
+                items[item_key] = item
+                scores[item_key] = 0.0
+            scores[item_key] += weight / (k + rank)
+
+    ranked = sorted(items, key=lambda item_key: scores[item_key], reverse=True)
+    if top_k is not None:
+        ranked = ranked[:top_k]
+    return [items[item_key] for item_key in ranked]
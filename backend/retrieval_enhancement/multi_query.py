@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from mcp.providers import LLMProvider
+from retrieval_enhancement.fusion import reciprocal_rank_fusion
+from retrieval_enhancement.query_enhancer import generate_hyde_document, rewrite_query
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REWRITE_TYPES = ["expansion", "disambiguation", "synonyms"]
+
+
+async def multi_query_retrieve(
+    query: str,
+    provider: LLMProvider,
+    search_many: Callable[[List[str]], List[List[Any]]],
+    key: Callable[[Any], Any],
+    top_k: int = 5,
+    rewrite_types: List[str] = None,
+    use_hyde: bool = True,
+    budget_seconds: float = 4.0
+) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    Retrieve with the original query, several rewrites and a HyDE passage, fused by reciprocal rank.
+
+    The rewrites and the HyDE passage are generated concurrently. Whatever
+    has arrived when `budget_seconds` runs out is used and the rest is
+    cancelled; if nothing arrived, this degrades to single-query retrieval.
+    All queries are then embedded and searched in one batch by `search_many`,
+    which is blocking and runs in a worker thread.
+
+    Returns the fused results and a report of what was used.
+    """
+    start = time.perf_counter()
+    rewrite_types = DEFAULT_REWRITE_TYPES if rewrite_types is None else rewrite_types
+
+    tasks: Dict[asyncio.Task, str] = {}
+    for rewriting_type in rewrite_types:
+        tasks[asyncio.ensure_future(rewrite_query(provider, query, rewriting_type))] = rewriting_type
+    if use_hyde:
+        tasks[asyncio.ensure_future(generate_hyde_document(provider, query))] = "hyde"
+
+    done, pending = await asyncio.wait(tasks, timeout=budget_seconds) if tasks else (set(), set())
+    for task in pending:
+        task.cancel()
+
+    queries = [query]
+    sources = ["original"]
+    failed = []
+    for task, source in tasks.items():
+        if task not in done:
+            continue
+        try:
+            generated = task.result().strip()
+        except Exception as e:
+            logger.error(f"Error generating {source} query: {e}")
+            failed.append(source)
+            continue
+        if generated and generated.lower() not in (q.lower() for q in queries):
+            queries.append(generated)
+            sources.append(source)
+    generation_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    result_lists = await asyncio.to_thread(search_many, queries)
+    results = reciprocal_rank_fusion(result_lists, key=key, top_k=top_k)
+
+    info = {
+        "mode": "multi_query" if len(queries) > 1 else "original",
+        "queries": sources,
+        "timed_out": [tasks[task] for task in pending],
+        "failed": failed,
+        "generation_ms": generation_ms,
+        "retrieval_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
+    logger.info(f"Multi-query retrieval used {sources}, timed out {info['timed_out']}")
+    return results, info
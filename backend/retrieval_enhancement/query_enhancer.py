@@ -2,17 +2,16 @@ from typing import List, Dict, Any
 from mcp.context import Context, MessageRole
 from mcp.providers import LLMProvider
 
-async def rewrite_query(provider: LLMProvider, original_query: str, rewriting_type: str = "expansion") -> str:
+def build_rewrite_context(original_query: str, rewriting_type: str = "expansion") -> Context:
     """
-    Rewrite a query to improve retrieval performance.
+    Build the LLM context used to rewrite a query.
     
     Args:
-        provider: The LLM provider to use for rewriting
         original_query: The user's original query
         rewriting_type: The type of rewriting to perform (expansion, disambiguation, or synonyms)
         
     Returns:
-        The rewritten query
+        The context to send to the provider
     """
     
     # Create a specialized system prompt based on the rewriting type
@@ -53,9 +52,11 @@ async def rewrite_query(provider: LLMProvider, original_query: str, rewriting_ty
         f"while making it more comprehensive for retrieval purposes."
     )
     
-    # Generate the rewritten query
-    rewritten_query = await provider.generate_response(context)
-    
+    return context
+
+
+def clean_rewritten_query(rewritten_query: str) -> str:
+    """Strip formatting from a rewritten query and cap its length."""
     # Remove any extra formatting like quotes or prefixes
     rewritten_query = rewritten_query.strip('"\'')
     
@@ -66,6 +67,26 @@ async def rewrite_query(provider: LLMProvider, original_query: str, rewriting_ty
     return rewritten_query
 
 
+async def rewrite_query(provider: LLMProvider, original_query: str, rewriting_type: str = "expansion") -> str:
+    """
+    Rewrite a query to improve retrieval performance.
+    
+    Args:
+        provider: The LLM provider to use for rewriting
+        original_query: The user's original query
+        rewriting_type: The type of rewriting to perform (expansion, disambiguation, or synonyms)
+        
+    Returns:
+        The rewritten query
+    """
+    context = build_rewrite_context(original_query, rewriting_type)
+    
+    # Generate the rewritten query
+    rewritten_query = await provider.generate_response(context)
+    
+    return clean_rewritten_query(rewritten_query)
+
+
 async def generate_hyde_document(provider: LLMProvider, query: str) -> str:
     """
     Generate a hypothetical document that would answer the query (HyDE technique).
@@ -0,0 +1,140 @@
+import logging
+import re
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+
+from retrieval_enhancement.speculative import STOPWORDS
+
+# Try to import sentence-transformers
+try:
+    from sentence_transformers import CrossEncoder
+    HAS_CROSS_ENCODER = True
+except ImportError:
+    HAS_CROSS_ENCODER = False
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens."""
+    return _TOKEN.findall(text.lower())
+
+
+class Reranker:
+    """Base class for second-stage rerankers."""
+
+    name = "none"
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """Relevance of each text to the query; higher is better."""
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def rerank(self, query: str, items: List[Any], text: Callable[[Any], str], top_k: int) -> List[Any]:
+        """Rescore first-stage candidates (best first) and keep the best `top_k`."""
+        if len(items) <= 1:
+            return items[:top_k]
+        scores = self.score(query, [text(item) for item in items])
+        # Stable sort, so ties keep the first-stage order
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [items[i] for i in order]
+
+
+class LexicalReranker(Reranker):
+    """
+    Rescore candidates by BM25 and query-term coverage, blended with their first-stage rank.
+
+    Only the query's terms are scored, so the work is a (candidates x query
+    terms) term-frequency matrix and a few array operations. Document
+    frequencies come from the candidates themselves, which is enough to
+    tell the distinctive query terms from the ones every candidate shares.
+    The first-stage rank is kept as a prior so that candidates the vector
+    search found for their meaning rather than their wording are not lost.
+    """
+
+    name = "lexical"
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, coverage_weight: float = 0.5, prior_weight: float = 0.3):
+        """Initialize the reranker."""
+        self.k1 = k1
+        self.b = b
+        self.coverage_weight = coverage_weight
+        self.prior_weight = prior_weight
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """BM25 and coverage of the query terms per text, plus the rank prior."""
+        n = len(texts)
+        prior = 1.0 - np.arange(n) / n
+
+        query_tokens = [token for token in tokenize(query) if token not in STOPWORDS] or tokenize(query)
+        terms = {term: i for i, term in enumerate(dict.fromkeys(query_tokens))}
+        if not terms:
+            return prior
+
+        # Term frequencies of the query terms in every candidate
+        lengths = np.zeros(n, dtype=np.float32)
+        rows, columns = [], []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[row] = len(tokens)
+            for token in tokens:
+                column = terms.get(token)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+        term_frequencies = np.zeros((n, len(terms)), dtype=np.float32)
+        np.add.at(term_frequencies, (rows, columns), 1.0)
+
+        query_weights = np.zeros(len(terms), dtype=np.float32)
+        np.add.at(query_weights, [terms[token] for token in query_tokens], 1.0)
+
+        present = term_frequencies > 0
+        document_frequency = present.sum(axis=0)
+        idf = np.log1p((n - document_frequency + 0.5) / (document_frequency + 0.5))
+        length_norm = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1.0))
+        saturated = term_frequencies * (self.k1 + 1) / (term_frequencies + length_norm[:, None])
+        bm25 = saturated @ (idf * query_weights)
+        if bm25.max() > 0:
+            bm25 = bm25 / bm25.max()
+
+        coverage = present.mean(axis=1)
+        return bm25 + self.coverage_weight * coverage + self.prior_weight * prior
+
+
+class CrossEncoderReranker(Reranker):
+    """Rescore candidates with a sentence-transformers cross-encoder, one batch per query."""
+
+    name = "cross-encoder"
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 32):
+        """Initialize the reranker."""
+        if not HAS_CROSS_ENCODER:
+            raise ImportError(
+                "sentence-transformers is required for this reranker. "
+                "Install it with 'pip install sentence-transformers'"
+            )
+
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """Cross-encoder relevance of each (query, text) pair."""
+        return np.asarray(self.model.predict([(query, text) for text in texts], batch_size=self.batch_size))
+
+
+def get_reranker(reranker_type: str = "none", **kwargs) -> Optional[Reranker]:
+    """Get a reranker by type, or None for "none"."""
+    if reranker_type == "none":
+        return None
+    elif reranker_type == "lexical":
+        return LexicalReranker(**kwargs)
+    elif reranker_type == "cross-encoder":
+        try:
+            return CrossEncoderReranker(**kwargs)
+        except Exception as e:
+            logger.warning(f"Cross-encoder not available ({e}), falling back to the lexical reranker")
+            return LexicalReranker()
+    else:
+        raise ValueError(f"Unsupported reranker type: {reranker_type}")
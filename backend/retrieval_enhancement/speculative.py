@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from retrieval_enhancement.fusion import reciprocal_rank_fusion
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "if", "of", "to", "in", "on", "at", "by", "for", "with",
+    "about", "from", "as", "into", "is", "are", "was", "were", "be", "been", "do", "does", "did",
+    "can", "could", "would", "should", "will", "what", "which", "who", "whom", "how", "why",
+    "when", "where", "this", "that", "these", "those", "it", "its", "i", "me", "my", "we", "our",
+    "you", "your", "he", "she", "they", "them", "their", "there", "here", "please", "tell",
+    "explain", "show", "give", "some", "any", "all", "so", "not", "no", "yes", "hi", "hello", "thanks"
+}
+
+_WORD = re.compile(r"\w+")
+
+
+def rewrite_skip_reason(query: str, long_query_words: int = 16, dense_min_words: int = 6, dense_ratio: float = 0.75) -> Optional[str]:
+    """
+    Decide cheaply whether rewriting a query is unlikely to help retrieval.
+
+    Returns the reason to skip, or None to rewrite. Queries without content
+    words (greetings, "thanks") have nothing to expand; long queries already
+    carry their own context; and keyword-dense queries already read like
+    search terms.
+    """
+    words = _WORD.findall(query.lower())
+    content_words = [word for word in words if word not in STOPWORDS]
+    if not content_words:
+        return "no_keywords"
+    if len(words) >= long_query_words:
+        return "long_query"
+    if len(words) >= dense_min_words and len(content_words) / len(words) >= dense_ratio:
+        return "keyword_dense"
+    return None
+
+
+async def speculative_retrieve(
+    query: str,
+    retrieve: Callable[[str], List[Any]],
+    rewrite: Callable[[], Awaitable[str]],
+    key: Callable[[Any], Any],
+    top_k: int = 5,
+    deadline_seconds: float = 1.5,
+    cached_rewrite: Optional[str] = None
+) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    Retrieve on the original query right away while a rewrite runs concurrently.
+
+    If the rewrite (or `cached_rewrite`) is available within `deadline_seconds`
+    of the start, results for it are fused with the original results by
+    reciprocal rank; otherwise the rewrite is cancelled and the original
+    results are returned. `retrieve` is blocking and runs in a worker thread.
+
+    Returns the results and a report of what happened.
+    """
+    start = time.perf_counter()
+    info: Dict[str, Any] = {"mode": "speculative"}
+    original_task = asyncio.ensure_future(asyncio.to_thread(retrieve, query))
+
+    rewritten = cached_rewrite
+    if rewritten is not None:
+        info["rewrite"] = "cached"
+    else:
+        rewrite_task = asyncio.ensure_future(rewrite())
+        try:
+            rewritten = await asyncio.wait_for(rewrite_task, timeout=deadline_seconds)
+            info["rewrite"] = "used"
+        except asyncio.TimeoutError:
+            info["rewrite"] = "timeout"
+        except Exception as e:
+            logger.error(f"Error rewriting query: {e}")
+            info["rewrite"] = "failed"
+        info["rewrite_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    original_results = await original_task
+    results = original_results[:top_k]
+
+    if rewritten and rewritten.strip().lower() != query.strip().lower():
+        rewritten_results = await asyncio.to_thread(retrieve, rewritten)
+        results = reciprocal_rank_fusion([original_results, rewritten_results], key=key, top_k=top_k)
+        info["rewritten_query"] = rewritten
+        logger.info(f"Query enhanced: {query} -> {rewritten}")
+
+    info["retrieval_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return results, info
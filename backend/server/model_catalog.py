@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def format_model_size(size: int) -> str:
+    """Human-readable model size (GB or MB)."""
+    if size > 1_000_000_000:  # If greater than 1GB
+        return f"{size / 1_000_000_000:.1f}GB"
+    return f"{size / 1_000_000:.1f}MB"
+
+
+class ModelCatalog:
+    """
+    Last known list of Ollama models, refreshed on a background thread.
+
+    Readers never wait on Ollama: `get` returns the cached list at once,
+    while the refresher polls /api/tags every `refresh_interval` seconds with
+    a short `timeout`. `invalidate` wakes the refresher early, e.g. after a
+    model switch. A failed refresh keeps serving the previous list.
+    `on_refresh` runs after every refresh attempt on the same thread.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        refresh_interval: float = 60.0,
+        timeout: float = 2.0,
+        on_refresh: Optional[Callable[[], Any]] = None
+    ):
+        """Initialize the catalog. Call `start` to begin refreshing."""
+        self.base_url = base_url
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.on_refresh = on_refresh
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._first_refresh = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="model-catalog", daemon=True)
+        self._models: Optional[List[Dict[str, Any]]] = None
+        self._fetched_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._stats = {"refreshes": 0, "failures": 0, "invalidations": 0}
+
+    def start(self) -> None:
+        """Start the refresh thread."""
+        if not self._thread.is_alive():
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self.refresh()
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+
+    def refresh(self) -> None:
+        """Fetch the model list from Ollama now."""
+        try:
+            response = httpx.get(f"{self.base_url}/api/tags", timeout=self.timeout)
+            if response.status_code != 200:
+                raise Exception(f"Ollama API error: {response.status_code}")
+
+            models = []
+            for model in response.json().get("models", []):
+                size = model.get("size", 0)
+                models.append({
+                    "name": model.get("name"),
+                    "size": format_model_size(size),
+                    "raw_size": size
+                })
+            # Sort by name
+            models.sort(key=lambda x: x["name"])
+
+            with self._lock:
+                self._models = models
+                self._fetched_at = time.time()
+                self._last_error = None
+                self._stats["refreshes"] += 1
+        except Exception as e:
+            with self._lock:
+                self._last_error = str(e)
+                self._stats["failures"] += 1
+            logger.warning(f"Error refreshing model list: {e}")
+        finally:
+            self._first_refresh.set()
+
+        if self.on_refresh is not None:
+            try:
+                self.on_refresh()
+            except Exception as e:
+                logger.warning(f"Error in model catalog refresh hook: {e}")
+
+    def invalidate(self) -> None:
+        """Refresh as soon as possible instead of waiting for the interval."""
+        with self._lock:
+            self._stats["invalidations"] += 1
+        self._wake.set()
+
+    def get(self, wait: float = 0.0) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the last known model list, or None if no refresh has succeeded yet.
+
+        `wait` bounds how long to wait for the very first refresh; later calls never block.
+        """
+        if wait > 0:
+            self._first_refresh.wait(wait)
+        with self._lock:
+            return [dict(model) for model in self._models] if self._models is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get refresh counters and the age of the cached list."""
+        with self._lock:
+            return {
+                **self._stats,
+                "models": len(self._models) if self._models is not None else None,
+                "age_seconds": round(time.time() - self._fetched_at, 1) if self._fetched_at else None,
+                "last_error": self._last_error
+            }
+
+
+def compute_etag(payload: Any) -> str:
+    """Strong ETag for a JSON-serializable payload."""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return '"' + hashlib.sha256(encoded).hexdigest()[:32] + '"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """
+    Whether an If-None-Match header matches `etag`.
+
+    The header is a comma-separated list of entity tags or "*". Matching is
+    exact per tag, using the weak comparison If-None-Match calls for, so a
+    "W/" prefix on either side is ignored.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
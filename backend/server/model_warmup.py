@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Union
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class ModelWarmer:
+    """
+    Loads Ollama models ahead of the first chat request and tracks which are resident.
+
+    A warm-up sends Ollama an empty generate request, which loads the model
+    into memory and keeps it there for `keep_alive`. Warm-ups run one at a
+    time on a background thread, so two loads never compete for memory and
+    callers never wait. Residency is read from Ollama's /api/ps, which also
+    notices models that Ollama unloaded on its own.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        keep_alive: Optional[Union[str, int]] = None,
+        load_timeout: float = 300.0,
+        status_timeout: float = 2.0
+    ):
+        """Initialize the warmer."""
+        self.base_url = base_url
+        self.keep_alive = keep_alive
+        self.load_timeout = load_timeout
+        self.status_timeout = status_timeout
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-warmup")
+        self._lock = threading.Lock()
+        self._states: Dict[str, Dict[str, Any]] = {}  # model -> state, timings, error
+        self._futures: Dict[str, Future] = {}
+
+    def warm_up(self, model: str) -> None:
+        """Start loading `model` in the background unless it is already loading or loaded."""
+        with self._lock:
+            future = self._futures.get(model)
+            if future is not None and not future.done():
+                return
+            if self._states.get(model, {}).get("state") == "loaded":
+                return
+            self._states[model] = {"state": "loading", "requested_at": time.time()}
+            self._futures[model] = self._executor.submit(self._load, model)
+
+    def _load(self, model: str) -> None:
+        payload: Dict[str, Any] = {"model": model}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+
+        start = time.perf_counter()
+        try:
+            response = httpx.post(f"{self.base_url}/api/generate", json=payload, timeout=self.load_timeout)
+            if response.status_code != 200:
+                raise Exception(f"Ollama API error: {response.status_code}")
+            load_ms = round((time.perf_counter() - start) * 1000, 1)
+            with self._lock:
+                self._states[model] = {"state": "loaded", "loaded_at": time.time(), "load_ms": load_ms}
+            logger.info(f"Warmed up model {model} in {load_ms} ms")
+        except Exception as e:
+            with self._lock:
+                self._states[model] = {"state": "failed", "error": str(e)}
+            logger.error(f"Error warming up model {model}: {e}")
+
+    def refresh(self) -> Dict[str, Dict[str, Any]]:
+        """Update residency from Ollama's running models and return the state of every known model."""
+        try:
+            response = httpx.get(f"{self.base_url}/api/ps", timeout=self.status_timeout)
+            running = {
+                model.get("name"): model for model in response.json().get("models", [])
+            } if response.status_code == 200 else None
+        except Exception as e:
+            logger.warning(f"Could not read running models from Ollama: {e}")
+            running = None
+
+        with self._lock:
+            if running is not None:
+                for name, model in running.items():
+                    state = self._states.setdefault(name, {})
+                    state.update({
+                        "state": "loaded",
+                        "size_vram": model.get("size_vram"),
+                        "expires_at": model.get("expires_at")
+                    })
+                for name, state in self._states.items():
+                    if name not in running and state.get("state") == "loaded":
+                        state["state"] = "unloaded"
+            return {name: dict(state) for name, state in self._states.items()}
+
+    def states(self) -> Dict[str, Dict[str, Any]]:
+        """Get the last known state of every known model without asking Ollama."""
+        with self._lock:
+            return {name: dict(state) for name, state in self._states.items()}
+
+    def state(self, model: str) -> str:
+        """Get the last known state of a model: loading, loaded, unloaded, failed or unknown."""
+        with self._lock:
+            return self._states.get(model, {}).get("state", "unknown")
+
+    def shutdown(self) -> None:
+        """Stop the background thread."""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,161 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseStore:
+    """
+    Keyed store for chat responses backed by SQLite.
+
+    Every write touches a single row, so saving a response costs the same no
+    matter how many responses are already stored. Responses that are still
+    being generated live only in memory; finished ones are persisted. Entries
+    older than the TTL are purged periodically and the file is compacted once
+    enough rows have been deleted.
+
+    Each in-flight response has a completion event, so readers can block in
+    `wait` until the response is finished instead of polling.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        ttl_seconds: float = 7 * 24 * 3600,
+        purge_every: int = 200,
+        compact_threshold: int = 1000
+    ):
+        """Open (or create) the response database."""
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.purge_every = purge_every
+        self.compact_threshold = compact_threshold
+
+        self._lock = threading.RLock()
+        self._pending: Dict[str, Dict[str, Any]] = {}  # In-flight responses
+        self._completion_events: Dict[str, threading.Event] = {}
+        self._writes_since_purge = 0
+        self._deleted_since_compact = 0
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "message_id TEXT PRIMARY KEY, "
+            "data TEXT NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_updated_at ON responses (updated_at)"
+        )
+        self.purge_expired()
+
+    def put(self, message_id: str, response_data: Dict[str, Any]) -> None:
+        """Store the latest state of a response."""
+        with self._lock:
+            if response_data.get("status") == "processing":
+                self._pending[message_id] = response_data
+                self._completion_events.setdefault(message_id, threading.Event())
+                return
+
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (message_id, data, updated_at) VALUES (?, ?, ?)",
+                    (message_id, json.dumps(response_data), time.time())
+                )
+            except Exception as e:
+                logger.error(f"Error saving response {message_id}: {e}")
+                # Keep serving the result from memory so waiters still get it
+                self._pending[message_id] = response_data
+            else:
+                self._pending.pop(message_id, None)
+
+            completion_event = self._completion_events.pop(message_id, None)
+            if completion_event:
+                completion_event.set()
+
+            self._writes_since_purge += 1
+            if self._writes_since_purge >= self.purge_every:
+                self.purge_expired()
+
+    def get(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """Get a response by message ID, or None if unknown or expired."""
+        with self._lock:
+            if message_id in self._pending:
+                return self._pending[message_id]
+
+            try:
+                row = self._conn.execute(
+                    "SELECT data, updated_at FROM responses WHERE message_id = ?",
+                    (message_id,)
+                ).fetchone()
+            except Exception as e:
+                logger.error(f"Error loading response {message_id}: {e}")
+                return None
+
+        if row is None:
+            return None
+
+        data, updated_at = row
+        if time.time() - updated_at > self.ttl_seconds:
+            return None
+        return json.loads(data)
+
+    def wait(self, message_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Get a response, blocking for up to `timeout` seconds while it is still processing.
+
+        Returns the latest state of the response, which is still `processing`
+        if the timeout expired first.
+        """
+        with self._lock:
+            completion_event = self._completion_events.get(message_id)
+
+        if completion_event:
+            completion_event.wait(timeout)
+        return self.get(message_id)
+
+    def __contains__(self, message_id: str) -> bool:
+        return self.get(message_id) is not None
+
+    def purge_expired(self) -> int:
+        """Delete responses older than the TTL. Returns the number of rows removed."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            self._writes_since_purge = 0
+            try:
+                cursor = self._conn.execute(
+                    "DELETE FROM responses WHERE updated_at < ?", (cutoff,)
+                )
+            except Exception as e:
+                logger.error(f"Error purging expired responses: {e}")
+                return 0
+
+            removed = max(cursor.rowcount, 0)
+            self._deleted_since_compact += removed
+            if removed:
+                logger.info(f"Purged {removed} expired responses")
+            if self._deleted_since_compact >= self.compact_threshold:
+                self.compact()
+            return removed
+
+    def compact(self) -> None:
+        """Reclaim space left behind by deleted rows."""
+        with self._lock:
+            try:
+                self._conn.execute("VACUUM")
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._deleted_since_compact = 0
+                logger.info("Compacted response store")
+            except Exception as e:
+                logger.error(f"Error compacting response store: {e}")
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
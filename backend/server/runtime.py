@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import threading
+import traceback
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the runtime's queue is full."""
+    pass
+
+
+class ChatRuntime:
+    """
+    Long-lived asyncio event loop, running on its own thread, that executes chat jobs as tasks.
+
+    At most `max_concurrency` jobs run at once; the rest wait in a queue of at
+    most `max_queue_size` entries. Submitting to a full queue raises
+    QueueFullError so the caller can apply backpressure.
+    """
+
+    def __init__(self, max_concurrency: int = 2, max_queue_size: int = 32):
+        """Initialize the runtime. Call `start` before submitting jobs."""
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="chat-runtime", daemon=True)
+        self._lock = threading.Lock()
+        self._queued: "OrderedDict[str, None]" = OrderedDict()  # Job IDs waiting for a slot
+        self._running: Dict[str, None] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def start(self) -> None:
+        """Start the event loop thread."""
+        if self._thread.is_alive():
+            return
+        self._thread.start()
+        # Create the semaphore on the loop that will use it
+        self.run(self._create_semaphore())
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _create_semaphore(self) -> None:
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def submit(self, job_id: str, job: Callable[[], Awaitable[Any]]) -> int:
+        """
+        Queue a job to run on the event loop.
+
+        `job` is called on the loop thread once a slot is free. Returns the
+        job's position in the queue (0 if it can start right away).
+        """
+        with self._lock:
+            if len(self._queued) >= self.max_queue_size:
+                raise QueueFullError(
+                    f"Chat queue is full ({self.max_queue_size} jobs waiting)"
+                )
+            self._queued[job_id] = None
+            position = self._position_locked(job_id)
+
+        asyncio.run_coroutine_threadsafe(self._run_job(job_id, job), self.loop)
+        return position
+
+    async def _run_job(self, job_id: str, job: Callable[[], Awaitable[Any]]) -> None:
+        async with self._semaphore:
+            with self._lock:
+                self._queued.pop(job_id, None)
+                self._running[job_id] = None
+            try:
+                await job()
+            except Exception as e:
+                logger.error(f"Unhandled error in chat job {job_id}: {e}")
+                logger.error(traceback.format_exc())
+            finally:
+                with self._lock:
+                    self._running.pop(job_id, None)
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the event loop from another thread and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """Get a job's position in the queue: 0 if running, None if unknown or finished."""
+        with self._lock:
+            return self._position_locked(job_id)
+
+    def _position_locked(self, job_id: str) -> Optional[int]:
+        if job_id in self._running:
+            return 0
+        if job_id not in self._queued:
+            return None
+        # Jobs start in submission order, so the position is the index among queued jobs
+        free_slots = max(self.max_concurrency - len(self._running), 0)
+        index = list(self._queued).index(job_id)
+        return max(index - free_slots + 1, 0)
+
+    def stats(self) -> Dict[str, int]:
+        """Get the current queue and concurrency figures."""
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "queued": len(self._queued),
+                "max_concurrency": self.max_concurrency,
+                "max_queue_size": self.max_queue_size
+            }
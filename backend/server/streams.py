@@ -0,0 +1,92 @@
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+
+class TokenStream:
+    """
+    Ordered log of token deltas for a single message.
+
+    Each event gets a sequential ID so a client that reconnects can pass the
+    last ID it saw and continue from there. The final event carries the
+    completed response and closes the stream.
+    """
+
+    def __init__(self, message_id: str):
+        """Initialize an empty, open stream."""
+        self.message_id = message_id
+        self.events: List[Tuple[str, Dict[str, Any]]] = []  # (event type, payload)
+        self.closed = False
+        self.closed_at: Optional[float] = None
+        self._condition = threading.Condition()
+
+    def push(self, delta: str) -> None:
+        """Append a token delta to the stream."""
+        if not delta:
+            return
+        with self._condition:
+            if self.closed:
+                return
+            self.events.append(("token", {"delta": delta}))
+            self._condition.notify_all()
+
+    def close(self, status: str, response: Optional[str]) -> None:
+        """Append the final event and wake up all readers."""
+        with self._condition:
+            if self.closed:
+                return
+            self.events.append(("done", {"status": status, "response": response}))
+            self.closed = True
+            self.closed_at = time.time()
+            self._condition.notify_all()
+
+    def read(self, after: int, timeout: float) -> Tuple[List[Tuple[int, str, Dict[str, Any]]], bool]:
+        """
+        Get the events with an ID greater than `after`.
+
+        Blocks for up to `timeout` seconds if no new events are available.
+        Returns the new events as (id, event type, payload) and whether the
+        stream is closed.
+        """
+        with self._condition:
+            if len(self.events) <= after and not self.closed:
+                self._condition.wait(timeout)
+            start = max(after, 0)
+            new_events = [
+                (index + 1, event, payload)
+                for index, (event, payload) in enumerate(self.events[start:], start=start)
+            ]
+            return new_events, self.closed
+
+
+class StreamRegistry:
+    """Thread-safe registry of token streams keyed by message ID."""
+
+    def __init__(self, retention_seconds: float = 300.0):
+        """Initialize the registry. Closed streams are kept for `retention_seconds`."""
+        self.retention_seconds = retention_seconds
+        self._streams: Dict[str, TokenStream] = {}
+        self._lock = threading.Lock()
+
+    def create(self, message_id: str) -> TokenStream:
+        """Create and register a stream for a message."""
+        stream = TokenStream(message_id)
+        with self._lock:
+            self._evict_expired()
+            self._streams[message_id] = stream
+        return stream
+
+    def get(self, message_id: str) -> Optional[TokenStream]:
+        """Get the stream for a message, if it is still retained."""
+        with self._lock:
+            return self._streams.get(message_id)
+
+    def _evict_expired(self) -> None:
+        """Drop closed streams that are past their retention period."""
+        cutoff = time.time() - self.retention_seconds
+        expired = [
+            message_id for message_id, stream in self._streams.items()
+            if stream.closed and stream.closed_at < cutoff
+        ]
+        for message_id in expired:
+            del self._streams[message_id]
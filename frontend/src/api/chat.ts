@@ -11,9 +11,16 @@ export interface ChatMessage {
     processed: boolean;
   }
   
+  export type RetrievalStrategy = 'default' | 'multi_query';
+  
   const API_URL = 'http://localhost:5000/api';
   
-  export const sendMessage = async (message: string, sessionId: string, enhanceQuery: boolean = true): Promise<string> => {
+  export const sendMessage = async (
+    message: string,
+    sessionId: string,
+    enhanceQuery: boolean = true,
+    retrievalStrategy: RetrievalStrategy = 'default'
+  ): Promise<string> => {
     try {
       // Send the message
       const response = await fetch(`${API_URL}/chat`, {
@@ -25,6 +32,7 @@ export interface ChatMessage {
           message,
           session_id: sessionId,
           enhance_query: enhanceQuery,
+          retrieval_strategy: retrievalStrategy,
         }),
       });
   
@@ -42,7 +50,8 @@ export interface ChatMessage {
   
   export const pollForResponse = async (messageId: string): Promise<string> => {
     try {
-      const response = await fetch(`${API_URL}/response?message_id=${messageId}`);
+      // Long-poll: the server holds the request until the response completes or `wait` seconds pass
+      const response = await fetch(`${API_URL}/response?message_id=${messageId}&wait=25`);
       
       if (!response.ok) {
         throw new Error('Failed to get response');
@@ -55,8 +64,7 @@ export interface ChatMessage {
       } else if (data.status === 'error') {
         throw new Error(data.response || 'An error occurred');
       } else {
-        // Still processing, wait and poll again
-        await new Promise(resolve => setTimeout(resolve, 1000));
+        // Still processing after the long-poll timeout, poll again
         return pollForResponse(messageId);
       }
     } catch (error) {
@@ -65,6 +73,38 @@ export interface ChatMessage {
     }
   };
   
+  // Stream a response over Server-Sent Events, calling onToken with the text received so far.
+  // EventSource reconnects on its own and sends Last-Event-ID, so the server resumes where it left off.
+  export const streamResponse = (messageId: string, onToken: (partial: string) => void): Promise<string> => {
+    return new Promise((resolve, reject) => {
+      let partial = '';
+      const source = new EventSource(`${API_URL}/chat/stream?message_id=${messageId}`);
+  
+      source.addEventListener('token', (event) => {
+        const data = JSON.parse((event as MessageEvent).data);
+        partial += data.delta;
+        onToken(partial);
+      });
+  
+      source.addEventListener('done', (event) => {
+        source.close();
+        const data = JSON.parse((event as MessageEvent).data);
+        if (data.status === 'completed') {
+          resolve(data.response);
+        } else {
+          reject(new Error(data.response || 'An error occurred'));
+        }
+      });
+  
+      source.onerror = () => {
+        // The server closed the stream without a final event, fall back to polling
+        if (source.readyState === EventSource.CLOSED) {
+          pollForResponse(messageId).then(resolve, reject);
+        }
+      };
+    });
+  };
+  
   export const uploadFile = async (file: File, sessionId: string): Promise<UploadedFile> => {
     try {
       const formData = new FormData();
@@ -150,22 +190,38 @@ export interface Model {
     name: string;
     size: string;
     raw_size: number;
+    state?: 'loading' | 'loaded' | 'unloaded' | 'failed' | 'unknown';
+    loaded?: boolean;
   }
   
+  // Last model list and its ETag, so unchanged lists are not re-sent
+  let cachedModels: Model[] = [];
+  let cachedModelsEtag: string | null = null;
+  
   // Get available models
   export const getModels = async (): Promise<Model[]> => {
     try {
-      const response = await fetch(`${API_URL}/models`);
+      const headers: HeadersInit = {};
+      if (cachedModelsEtag) {
+        headers['If-None-Match'] = cachedModelsEtag;
+      }
+      const response = await fetch(`${API_URL}/models`, { headers });
+      
+      if (response.status === 304) {
+        return cachedModels;
+      }
       
       if (!response.ok) {
         throw new Error('Failed to get models');
       }
       
       const data = await response.json();
-      return data.models || [];
+      cachedModels = data.models || [];
+      cachedModelsEtag = response.headers.get('ETag');
+      return cachedModels;
     } catch (error) {
       console.error('Error getting models:', error);
-      return [];
+      return cachedModels;
     }
   };
   
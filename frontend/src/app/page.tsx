@@ -9,7 +9,7 @@ import { FilePanel } from '@/components/Chat/FilePanel';
 import { MemoryModal } from '@/components/Chat/MemoryModal';
 import { SummaryPanel } from '@/components/Chat/SummaryPanel';
 import { ThemeToggle } from "@/components/ThemeToggle";
-import { sendMessage, pollForResponse, uploadFile, getFiles, getMemory, getSummary, ChatMessage as ChatMessageType, UploadedFile, Chunk, getDocumentChunks } from '@/api/chat';
+import { sendMessage, pollForResponse, streamResponse, uploadFile, getFiles, getMemory, getSummary, ChatMessage as ChatMessageType, UploadedFile, Chunk, getDocumentChunks } from '@/api/chat';
 import { ModelSelector } from "@/components/Chat/ModelSelector";
 import { DocumentVisualization } from '@/components/Chat/DocumentVisualization';
 
@@ -158,8 +158,14 @@ export default function Home() {
       // Send message to API with query enhancement preference
       const messageId = await sendMessage(finalContent, sessionId, enhanceQueries);
   
-      // Poll for response
-      const response = await pollForResponse(messageId);
+      // Stream the response, showing tokens as they arrive
+      const response = typeof EventSource !== 'undefined'
+        ? await streamResponse(messageId, (partial) => {
+            setMessages((prev) =>
+              prev.map((msg) => (msg.id === tempId ? { ...msg, content: partial } : msg))
+            );
+          })
+        : await pollForResponse(messageId);
   
       // Replace temporary message with actual response
       setMessages((prev) =>
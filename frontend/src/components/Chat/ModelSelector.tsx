@@ -93,7 +93,12 @@ export const ModelSelector = ({ sessionId, onModelChange }: ModelSelectorProps)
                       `}
                       onClick={() => handleModelChange(model.name)}
                     >
-                      <span className="truncate">{model.name}</span>
+                      <span className="truncate flex items-center gap-1.5">
+                        {model.loaded && (
+                          <span className="w-1.5 h-1.5 rounded-full bg-green-500 flex-shrink-0" title="Loaded in memory"></span>
+                        )}
+                        {model.name}
+                      </span>
                       <span className="text-xs text-neutral-500 dark:text-neutral-400 ml-2">{model.size}</span>
                     </button>
                   ))}